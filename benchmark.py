@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+'''Compare the legacy and current Browser parsing on saved pages.
+
+usage: benchmark.py [-n NUMBER] [-e ENCODING] [-r TAG#ID] FILE [FILE ...]
+'''
+import re
+import timeit
+import argparse
+
+from lxml import html
+
+from mediacore.web.parser import get_tree
+
+
+RE_SCRIPT = re.compile(r'<script\b.*?</script>', re.DOTALL)
+
+
+def legacy_get_tree(data, encoding=None):
+    data = RE_SCRIPT.sub('', data)
+    if encoding:
+        data = data.decode(encoding, 'replace')
+    return html.fromstring(data)
+
+def run(files, number=20, encoding=None, root=None):
+    for file in files:
+        with open(file, 'rb') as fd:
+            data = fd.read()
+
+        print '%s (%s KB):' % (file, len(data) / 1024)
+        for name, callable in [
+                ('legacy', lambda: legacy_get_tree(data, encoding)),
+                ('current', lambda: get_tree(data, encoding)),
+                ('current subtree', lambda: get_tree(data, encoding, root)),
+                ]:
+            if name == 'current subtree' and not root:
+                continue
+            duration = min(timeit.repeat(callable, number=number, repeat=3))
+            print '    %-16s %.2f ms' % (name, duration * 1000. / number)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the Browser parsing methods on saved pages.')
+    parser.add_argument('files', nargs='+', help='saved HTML pages')
+    parser.add_argument('-n', '--number', type=int, default=20, help='number of runs')
+    parser.add_argument('-e', '--encoding', help='declared charset')
+    parser.add_argument('-r', '--root', help='subtree root element (e.g.: table#searchResult)')
+    args = parser.parse_args()
+
+    root = tuple(args.root.split('#', 1)) if args.root else None
+    run(args.files, number=args.number, encoding=args.encoding, root=root)
+
+
+if __name__ == '__main__':
+    main()
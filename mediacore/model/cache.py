@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+from mediacore.utils.db import Model
+
+
+MAX_AGE = 86400     # seconds
+
+
+class SearchCache(Model):
+    '''Plugins search results, stored as rows of values
+    sharing the fields list.
+    '''
+    COL = 'search_cache'
+
+    @classmethod
+    def get_results(cls, key, ttl):
+        '''Get the results cached less than ttl seconds ago.
+
+        :return: list of dicts or None
+        '''
+        res = cls.find_one({
+                'key': key,
+                'created': {'$gt': datetime.utcnow() - timedelta(seconds=ttl)},
+                })
+        if res:
+            fields = res['fields']
+            return [dict(zip(fields, row)) for row in res['rows']]
+
+    @classmethod
+    def set_results(cls, key, results):
+        fields = sorted(set([k for r in results for k in r.keys()]))
+        rows = [[r.get(k) for k in fields] for r in results]
+        now = datetime.utcnow()
+        cls.update({'key': key}, {
+                'key': key,
+                'fields': fields,
+                'rows': rows,
+                'created': now,
+                }, upsert=True, safe=True)
+        cls.remove({'created': {'$lt': now - timedelta(seconds=MAX_AGE)}}, safe=True)
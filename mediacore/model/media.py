@@ -3,9 +3,9 @@ from datetime import datetime
 import logging
 
 from mediacore.utils.db import Model
+from mediacore.utils.title import get_title, get_search_pattern
 
 from filetools.media import files, get_file, get_mtime
-from filetools.title import Title
 
 
 TYPES_DEF = {
@@ -62,7 +62,7 @@ class Media(Model):
 
         info = {}
 
-        title = Title(name)
+        title = get_title(name)
         for key in ('full_name', 'display_name', 'name',
                 'season', 'episode', 'date', 'rip', 'langs'):
             info[key] = getattr(title, key)
@@ -107,24 +107,22 @@ class Media(Model):
         '''Get media matching the parameters.
         '''
         spec = {'info.subtype': category}
-        name_ = Title(name)
 
         if category == 'movies':
-            spec['info.full_name'] = {'$regex': name_.get_search_pattern(), '$options': 'i'}
+            spec['info.full_name'] = {'$regex': get_search_pattern(name), '$options': 'i'}
 
         elif category in ('tv', 'anime'):
             spec['info.subtype'] = 'tv'
-            spec['info.name'] = {'$regex': name_.get_search_pattern(category='tv'), '$options': 'i'}
+            spec['info.name'] = {'$regex': get_search_pattern(name, category='tv'), '$options': 'i'}
             if kwargs.get('season'):
                 spec['info.season'] = str(kwargs['season'])
             if kwargs.get('episode'):
                 spec['info.episode'] = {'$regex': '^0*%s$' % kwargs['episode']}
 
         elif category == 'music':
-            spec['info.artist'] = {'$regex': name_.get_search_pattern(), '$options': 'i'}
+            spec['info.artist'] = {'$regex': get_search_pattern(name), '$options': 'i'}
             if kwargs.get('album'):
-                album_ = Title(kwargs['album'])
-                spec['info.album'] = {'$regex': album_.get_search_pattern(), '$options': 'i'}
+                spec['info.album'] = {'$regex': get_search_pattern(kwargs['album']), '$options': 'i'}
 
         return list(cls.find(spec))
 
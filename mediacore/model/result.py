@@ -8,6 +8,9 @@ class Result(Model):
 
     @classmethod
     def add_result(cls, result, search_id):
+        if hasattr(result, 'resolve') and not result.resolve():
+            return  # failed to get the deferred values
+
         spec = {'search_id': search_id}
         if result.get('hash'):
             spec['hash'] = result.hash
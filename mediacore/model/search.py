@@ -4,6 +4,7 @@ import logging
 from mediacore.utils.db import Model
 from mediacore.web.info import (get_movies_titles,
         get_music_albums, InfoError)
+from mediacore.web.search import remove_marks
 
 
 EXTRA_KEYS = ['album', 'season', 'episode']
@@ -33,6 +34,19 @@ class Search(Model):
             doc['safe'] = safe
             return cls.insert(doc, safe=True)
 
+    @classmethod
+    def remove(cls, spec_or_id=None, **kwargs):
+        '''Remove the searches and their results high-water marks.
+        '''
+        spec = spec_or_id
+        if spec is not None and not isinstance(spec, dict):
+            spec = {'_id': spec}
+        ids = [s['_id'] for s in cls.find(spec, fields=['_id'])]
+        res = super(Search, cls).remove(spec_or_id, **kwargs)
+        for id in ids:
+            remove_marks(id)
+        return res
+
     @classmethod
     def get_query(cls, search):
         query = search['name']
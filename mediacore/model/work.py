@@ -16,6 +16,19 @@ class Work(Model):
                 {'$set': {'section': section, 'info.%s' % key: value}},
                 upsert=True, safe=True)
 
+    @classmethod
+    def inc_info(cls, section, key, value=1):
+        '''Atomically increment the info key and get the updated info.
+        '''
+        res = cls.find_and_modify({'section': section},
+                {'$inc': {'info.%s' % key: value}}, upsert=True, new=True)
+        return res.get('info', {})
+
+    @classmethod
+    def unset_info(cls, section, keys):
+        cls.update({'section': section},
+                {'$unset': dict([('info.%s' % k, 1) for k in keys])}, safe=True)
+
     @classmethod
     def set_infos(cls, section, info, overwrite=False):
         doc = {'section': section, 'info': info}
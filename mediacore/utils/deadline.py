@@ -0,0 +1,119 @@
+import time
+from functools import wraps
+from inspect import isgeneratorfunction
+from threading import local
+from contextlib import contextmanager
+
+from systools.system import TimeoutError
+
+
+_local = local()
+
+
+class Deadline(object):
+
+    def __init__(self, seconds, parent=None):
+        self.end = time.time() + seconds
+        if parent and parent.end < self.end:
+            self.end = parent.end
+        self.parent = parent
+        self.exceeded = False
+
+    def remaining(self):
+        res = max(0, self.end - time.time())
+        if self.parent:
+            res = min(res, self.parent.remaining())
+        return res
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def cancel(self):
+        '''Expire the deadline and its nested deadlines,
+        e.g.: from another thread.
+        '''
+        self.end = time.time()
+
+    def check(self):
+        if self.expired():
+            deadline = self
+            while deadline:
+                if deadline.expired():
+                    deadline.exceeded = True
+                deadline = deadline.parent
+            raise TimeoutError('deadline exceeded')
+
+
+def _get_stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+def get_current():
+    '''Get the current thread nearest deadline.
+    '''
+    stack = _get_stack()
+    return stack[-1] if stack else None
+
+@contextmanager
+def deadline(seconds):
+    '''Run the block with a time budget, limited by the enclosing deadlines.
+    '''
+    stack = _get_stack()
+    deadline_ = Deadline(seconds, parent=stack[-1] if stack else None)
+    stack.append(deadline_)
+    try:
+        yield deadline_
+    finally:
+        stack.remove(deadline_)
+
+def remaining(default=None):
+    '''Get the remaining time of the current deadline.
+    '''
+    deadline_ = get_current()
+    return deadline_.remaining() if deadline_ else default
+
+def check():
+    '''Raise a TimeoutError if the current deadline is exceeded.
+    '''
+    deadline_ = get_current()
+    if deadline_:
+        deadline_.check()
+
+def get_timeout(seconds):
+    '''Get a sockets timeout limited by the current deadline.
+    '''
+    check()
+    res = remaining()
+    return seconds if res is None else min(seconds, res)
+
+def timeout(seconds):
+    '''Decorator limiting the time spent in the decorated function
+    and in the nested network calls.
+
+    Generator functions get the time budget for each iteration.
+    A TimeoutError is raised when the function was cut short
+    by the deadline.
+    '''
+    def decorator(func):
+        def run(callable):
+            with deadline(seconds) as deadline_:
+                res = callable()
+            if deadline_.exceeded:
+                raise TimeoutError('%s timed out after %s seconds' % (func.__name__, seconds))
+            return res
+
+        if isgeneratorfunction(func):
+            def wrapper(*args, **kwargs):
+                generator = func(*args, **kwargs)
+                while True:
+                    try:
+                        res = run(generator.next)
+                    except StopIteration:
+                        return
+                    yield res
+        else:
+            def wrapper(*args, **kwargs):
+                return run(lambda: func(*args, **kwargs))
+        return wraps(func)(wrapper)
+    return decorator
@@ -0,0 +1,73 @@
+import time
+from Queue import Queue, Empty
+from threading import Thread
+import logging
+
+from mediacore.utils.deadline import deadline
+
+
+logger = logging.getLogger(__name__)
+
+
+def run_tasks(tasks, timeout=None):
+    '''Run tasks in threads, each task being started
+    as soon as its dependencies are resolved.
+
+    :param tasks: dict of task name -> (callable, dependencies names list),
+        the callable receives the dependencies results as keyword arguments
+    :param timeout: overall timeout in seconds
+
+    :return: dict of the finished tasks results
+    '''
+    for name, (callable, deps) in tasks.items():
+        for dep in deps:
+            if dep not in tasks:
+                raise ValueError('unknown dependency "%s" for task "%s"' % (dep, name))
+
+    queue = Queue()
+    results = {}
+    running = set()
+    end = time.time() + timeout if timeout is not None else None
+
+    def worker(name, callable, kwargs):
+        try:
+            if end is None:
+                res = callable(**kwargs)
+            else:
+                with deadline(end - time.time()):
+                    res = callable(**kwargs)
+        except Exception, e:
+            logger.exception('failed to run task "%s": %s', name, str(e))
+            res = None
+        queue.put((name, res))
+
+    def start_ready():
+        for name, (callable, deps) in tasks.items():
+            if name in results or name in running:
+                continue
+            if not set(deps) <= set(results):
+                continue
+            kwargs = dict([(dep, results[dep]) for dep in deps])
+            thread = Thread(target=worker, args=(name, callable, kwargs))
+            thread.daemon = True
+            thread.start()
+            running.add(name)
+
+    start_ready()
+    while running:
+        wait = None
+        if end is not None:
+            wait = end - time.time()
+            if wait <= 0:
+                break
+        try:
+            name, res = queue.get(timeout=wait)
+        except Empty:
+            break
+        running.discard(name)
+        results[name] = res
+        start_ready()
+
+    if running:
+        logger.info('tasks %s not finished after %s seconds', sorted(running), timeout)
+    return results
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+from threading import Lock
+
+from filetools.title import Title
+
+
+CACHE_SIZE = 5000   # items
+
+
+class LruCache(object):
+    '''Thread-safe bounded LRU cache counting the hits and misses.
+    '''
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, callable):
+        '''Get the cached value or the result of callable.
+        '''
+        with self._lock:
+            if key in self._items:
+                self.hits += 1
+                self._items[key] = val = self._items.pop(key)
+                return val
+            self.misses += 1
+
+        val = callable()
+        with self._lock:
+            self._items[key] = val
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+        return val
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'hits': self.hits,
+                'misses': self.misses,
+                }
+
+    def clear(self):
+        with self._lock:
+            self._items = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+
+
+titles = LruCache()
+patterns = LruCache()
+
+
+def get_title(name):
+    '''Get the parsed Title of a string,
+    shared by the callers so it must not be modified.
+    '''
+    return titles.get(name, lambda: Title(name))
+
+def get_search_pattern(name, **kwargs):
+    key = ('pattern', name, tuple(sorted(kwargs.items())))
+    return patterns.get(key, lambda: get_title(name).get_search_pattern(**kwargs))
+
+def get_search_re(name, **kwargs):
+    '''Get the compiled search regex of a string.
+
+    :param kwargs: Title.get_search_re() parameters (e.g.: mode)
+    '''
+    key = ('re', name, tuple(sorted(kwargs.items())))
+    return patterns.get(key, lambda: get_title(name).get_search_re(**kwargs))
+
+def get_stats():
+    return {
+        'titles': titles.get_stats(),
+        'patterns': patterns.get_stats(),
+        }
+
+def clear():
+    titles.clear()
+    patterns.clear()
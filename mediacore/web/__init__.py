@@ -1,12 +1,15 @@
 import os.path
-from datetime import datetime, timedelta
+import time
 from functools import wraps
 import re
 import socket
 import cookielib
 from httplib import HTTPException
 from urllib2 import URLError, HTTPError
-import gzip
+from urlparse import urlsplit
+from collections import OrderedDict
+from threading import Thread, Event, Lock
+import zlib
 import logging
 
 logging.getLogger('urllib3').setLevel(logging.ERROR)
@@ -23,18 +26,28 @@ logging.getLogger('pyscreenshot').setLevel(logging.ERROR)
 logging.getLogger('easyprocess').setLevel(logging.ERROR)
 from pyvirtualdisplay.smartdisplay import SmartDisplay
 
-from systools.system import timeout, TimeoutError
+from systools.system import TimeoutError
 
 from filetools.title import clean
 
-from mediacore.model.work import Work
+from mediacore.utils.deadline import timeout, deadline, get_timeout, remaining
+from mediacore.web.pool import HTTPHandler, HTTPSHandler
+from mediacore.web import mirrors, stats
+from mediacore.web.cache import CacheHandler
+from mediacore.web.parser import get_tree
+from mediacore.web.compression import ACCEPT_ENCODING, read, is_binary
+from mediacore.web.sessions import get_session
+from mediacore.web.ratelimit import limiter
+from mediacore.web.controller import controller, get_retry_after
 
 
 USER_AGENT = 'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/536.6 (KHTML, like Gecko) Chrome/20.0.1092.0 Safari/536.6'
-RE_SCRIPT = re.compile(r'<script\b.*?</script>', re.DOTALL)
 RE_LINK_TITLE = re.compile(r'<a\s*.*?>(.*?)</a>', re.I)
-RE_ENCODING = re.compile(r'.*charset=([^\s]+)', re.I)
+RE_ENCODING = re.compile(r'.*charset=([^\s;"\']+)', re.I)
+RE_OVERLOAD = re.compile(r'please\s+try\s+again\s+in\s+a\s+few\s+seconds', re.I)
+OVERLOAD_CODES = (429, 503)
 REQUEST_TIMEOUT = 30
+PREFETCH_SIZE = 10  # prefetched pages kept per browser
 
 logger = logging.getLogger(__name__)
 
@@ -46,68 +59,215 @@ class NoHistory(object):
     def add(self, *args, **kwargs): pass
     def clear(self): pass
 
+
+class Prefetch(object):
+    '''Page fetched in the background by a side browser.
+    '''
+    def __init__(self, browser, url):
+        self.browser = browser
+        self.url = url
+        self.response = None
+        self.used = False
+        self._event = Event()
+        self._deadline = None
+
+    def run(self):
+        try:
+            with deadline(REQUEST_TIMEOUT) as self._deadline:
+                self.response = self.browser.open(self.url)
+        finally:
+            self._event.set()
+
+    def cancel(self):
+        '''Stop waiting for a request slot of the host.
+        '''
+        if self._deadline:
+            self._deadline.cancel()
+
+    def wait(self, timeout=None):
+        self._event.wait(timeout)
+        return self._event.is_set()
+
 class Browser(mechanize.Browser):
+    # Use the process-wide keep-alive connections pool
+    handler_classes = dict(mechanize.Browser.handler_classes,
+            http=HTTPHandler, https=HTTPSHandler)
 
     def __init__(self, user_agent=USER_AGENT, robust_factory=False,
-                debug_http=False, cookie_jar=None, cookie_file=None):
+                debug_http=False, cookie_jar=None, cookie_file=None,
+                cache_ttl=None, tree_root=None, overload_re=None,
+                site=None):
+        self._args = {
+            'user_agent': user_agent,
+            'robust_factory': robust_factory,
+            'cache_ttl': cache_ttl,
+            'tree_root': tree_root,
+            'overload_re': overload_re,
+            'site': site,
+            }
         args = {'history': NoHistory()}
         if robust_factory:
             args['factory'] = mechanize.RobustFactory()
         mechanize.Browser.__init__(self, **args)    # mechanize.Browser is an old style class
-        self.addheaders = [('User-Agent', user_agent)]
+        self.addheaders = [
+            ('User-Agent', user_agent),
+            ('Accept-Encoding', ACCEPT_ENCODING),
+            ]
         self.set_handle_robots(False)
         self.set_handle_refresh(False)
 
-        if cookie_file and cookie_jar is not None:
+        if cookie_jar is not None:
             self.set_cookiejar(cookie_jar)
-            if os.path.exists(cookie_file):
+            if cookie_file and os.path.exists(cookie_file):
                 cookie_jar.load(cookie_file,
                         ignore_discard=False, ignore_expires=False)
 
+        if cache_ttl:
+            self.add_handler(CacheHandler(cache_ttl))
+
         if debug_http:
             self.set_debug_http(True)
         self.tree = None
+        self.tree_root = tree_root
+        self.overload_re = overload_re
         self.url_error = None
+        self.overloaded = False
+        self.site = site
+        self._prefetched = OrderedDict()
+        self._prefetch_lock = Lock()
+        self._prefetch_stop = Event()
 
     def _handle_response(self, response):
-        if response.info().getheader('content-encoding') == 'gzip':
+        '''Decode the responses which did not go through the connections pool.
+        '''
+        headers = response.info()
+        if headers.getheader('content-encoding'):
             try:
-                gz = gzip.GzipFile(fileobj=response, mode='rb')
-                data = gz.read()
+                data, complete = read(response, headers)
+            except zlib.error, e:
+                logger.error('failed to decode response from %s: %s', response.geturl(), str(e))
+            else:
                 response.set_data(data)
                 self.set_response(response)
-            except IOError:
-                pass
-            finally:
-                gz.close()
         return response
 
     def _get_tree(self, response):
-        response_data = response.get_data()
-        data = RE_SCRIPT.sub('', response_data)
-
-        content_type = response.info().getheader('content-type')
+        data = response.get_data()
+        content_type = response.info().getheader('content-type') or ''
         res = RE_ENCODING.findall(content_type)
-        if res:
-            try:
-                data = data.decode(res[0], 'replace')
-            except Exception, e:
-                logger.error('failed to decode "%s" at %s: %s', res[0],
-                        response.geturl(), str(e))
+        encoding = res[0] if res else None
 
         try:
-            return html.fromstring(data)
+            return get_tree(data, encoding=encoding, root=self.tree_root)
         except Exception, e:
-            logger.error('failed to parse "%s" at %s: %s', response_data,
+            logger.error('failed to parse "%s" at %s: %s', data[:1000],
                     response.geturl(), str(e))
 
-    @timeout(REQUEST_TIMEOUT)
-    def _mech_open_wrapper(self, *args, **kwargs):
-        return mechanize.Browser._mech_open(self, *args, **kwargs)
+    def _is_overloaded(self, response):
+        if not self.overload_re or is_binary(response.info()):
+            return False
+        return bool(self.overload_re.search(response.get_data()))
+
+    def _controlled_open(self, url, *args, **kwargs):
+        host = urlsplit(url).netloc
+        controller.acquire(host)
+        retry_after = None
+        failed = True
+        try:
+            res = mechanize.Browser._mech_open(self, *args, **kwargs)
+            res = self._handle_response(res)
+            self.overloaded = self._is_overloaded(res)
+            failed = False
+            return res
+        except HTTPError, e:
+            if e.code in OVERLOAD_CODES:
+                self.overloaded = True
+                retry_after = get_retry_after(e.info())
+            else:
+                failed = False  # the host answered
+            raise
+        except (socket.timeout, TimeoutError):
+            self.overloaded = True
+            raise
+        except URLError, e:
+            if isinstance(e.reason, socket.timeout):
+                self.overloaded = True
+            raise
+        finally:
+            controller.release(host, overloaded=self.overloaded,
+                    retry_after=retry_after, failed=failed)
+
+    def _clone(self):
+        '''Get a browser with the same settings, sharing the cookies.
+        '''
+        browser = Browser(cookie_jar=self._ua_handlers['_cookies'].cookiejar,
+                **self._args)
+        browser.addheaders = list(self.addheaders)
+        return browser
+
+    def prefetch(self, get_url, pages):
+        '''Fetch pages in the background while the current page
+        is processed. The next open() of a prefetched url
+        uses the prefetched response.
+
+        :param get_url: callable taking a browser and a page number,
+            returning the page url linked from the browser current page
+        :param pages: pages numbers, the first one linked from the current page
+        '''
+        url = get_url(self, pages[0]) if pages else None
+        if url:
+            thread = Thread(target=self._prefetch,
+                    args=(get_url, url, pages, self._prefetch_stop))
+            thread.daemon = True
+            thread.start()
+
+    def stop_prefetch(self):
+        '''Stop fetching the next pages and drop the unused ones,
+        e.g.: when the results are not consumed anymore.
+        '''
+        with self._prefetch_lock:
+            self._prefetch_stop.set()
+            self._prefetch_stop = Event()
+            prefetched, self._prefetched = self._prefetched, OrderedDict()
+        for prefetch in prefetched.values():
+            prefetch.cancel()
+
+    def _prefetch(self, get_url, url, pages, stop):
+        for i, page in enumerate(pages):
+            with self._prefetch_lock:
+                if stop.is_set():
+                    return
+                prefetch = self._prefetched.get(url)
+                started = prefetch is not None
+                if not started:
+                    prefetch = Prefetch(self._clone(), url)
+                    self._prefetched[url] = prefetch
+                    while len(self._prefetched) > PREFETCH_SIZE:
+                        self._prefetched.popitem(last=False)
+
+            if not started:
+                prefetch.run()
+            elif not prefetch.wait(REQUEST_TIMEOUT):
+                return
+            if not prefetch.response or i == len(pages) - 1:
+                return
+            url = get_url(prefetch.browser, pages[i + 1])
+            if not url:
+                return
+
+    def _get_prefetched(self, url):
+        with self._prefetch_lock:
+            prefetch = self._prefetched.get(url)
+            if not prefetch or prefetch.used:
+                return None
+            prefetch.used = True
+        if prefetch.wait(remaining(REQUEST_TIMEOUT)) and prefetch.response:
+            return prefetch
 
     def _mech_open(self, *args, **kwargs):
         self.tree = None
         self.url_error = None
+        self.overloaded = False
 
         def get_url():
             url = kwargs.get('url', args[0])
@@ -115,19 +275,39 @@ class Browser(mechanize.Browser):
                 url = url.get_full_url()
             return url
 
-        kwargs['timeout'] = REQUEST_TIMEOUT
+        data = kwargs.get('data', args[1] if len(args) > 1 else None)
+        prefetch = self._get_prefetched(get_url()) if data is None else None
+        if prefetch:
+            browser = prefetch.browser
+            self.request = browser.request
+            self._set_response(browser.response(), True)
+            self.tree = browser.tree
+            self.overloaded = browser.overloaded
+            return self.response()
+
         try:
-            res = self._mech_open_wrapper(*args, **kwargs)
-            res = self._handle_response(res)
-            self.tree = self._get_tree(res)
+            with stats.request(self.site, get_url()):
+                with deadline(REQUEST_TIMEOUT):
+                    kwargs['timeout'] = get_timeout(REQUEST_TIMEOUT)
+                    res = self._controlled_open(get_url(), *args, **kwargs)
+                if not is_binary(res.info()):
+                    begin = time.time()
+                    self.tree = self._get_tree(res)
+                    stats.add_timing('parse', time.time() - begin)
             return res
         except HTTPError, e:
             self.url_error = e
+            if e.code >= 500:
+                mirrors.report_failure(get_url())
+            logger.error('network error for %s: %s', get_url(), str(e))
+        except TimeoutError, e:
             logger.error('network error for %s: %s', get_url(), str(e))
-        except (socket.timeout, TimeoutError), e:
+        except socket.timeout, e:
+            mirrors.report_failure(get_url())
             logger.error('network error for %s: %s', get_url(), str(e))
         except (HTTPException, URLError, socket.gaierror,
                 socket.error, mechanize.BrowserStateError), e:
+            mirrors.report_failure(get_url())
             logger.error('network error for %s: %s', get_url(), str(e))
         except Exception, e:
             logger.exception('exception (args: %s, %s): %s', args, kwargs, str(e))
@@ -138,6 +318,14 @@ class Browser(mechanize.Browser):
         except (mechanize.LinkNotFoundError, mechanize.BrowserStateError):
             pass
 
+    def find_link_url(self, **kwargs):
+        '''Get the absolute url of a link of the current page.
+        '''
+        try:
+            return self.find_link(**kwargs).absolute_url
+        except (mechanize.LinkNotFoundError, mechanize.BrowserStateError):
+            pass
+
     def cssselect(self, selector, default=None):
         if self.tree is None:
             return default
@@ -188,8 +376,8 @@ class RealBrowser(webdriver.Firefox):
         super(RealBrowser, self).quit()
         self._abstract_display.stop()
 
-    @timeout(REQUEST_TIMEOUT)
     def _open(self, url):
+        self.set_page_load_timeout(get_timeout(REQUEST_TIMEOUT))
         self.get(url)
 
     def open(self, url):
@@ -204,28 +392,89 @@ class Base(object):
     '''Base website class.
     '''
     ROBUST_FACTORY = False
-
-    def __init__(self, cookie_file=None, debug_http=False):
-        self.cookie_jar = cookielib.LWPCookieJar() if cookie_file else None
+    CACHE_TTL = None    # responses cache ttl in seconds
+    TREE_ROOT = None    # (tag, id) of the only element to parse in pages
+    OVERLOAD_RE = None  # overload marker searched in the pages
+    SESSION_TTL = 3600  # seconds before checking again a logged in session
+
+    def __init__(self, cookie_file=None, debug_http=False, username=None):
+        if username:
+            self.session = get_session(self.__class__.__name__.lower(), username)
+            self.cookie_jar = self.session.cookie_jar
+        else:
+            self.session = None
+            self.cookie_jar = cookielib.LWPCookieJar() if cookie_file else None
         self.browser = Browser(robust_factory=self.ROBUST_FACTORY,
                 debug_http=debug_http, cookie_jar=self.cookie_jar,
-                cookie_file=cookie_file)
+                cookie_file=cookie_file, cache_ttl=self.CACHE_TTL,
+                tree_root=self.TREE_ROOT, overload_re=self.OVERLOAD_RE,
+                site=self.__class__.__module__.rsplit('.', 1)[-1])
         self.url = self._get_url()
         self.accessible = True if self.url else False
 
     def _get_url(self):
         if not isinstance(self.URL, (tuple, list)):
             self.URL = [self.URL]
+        return mirrors.get_url(self.URL, self.browser.open)
 
-        for url in self.URL:
-            if self.browser.open(url):
-                return url
+    def _next_url(self, page, browser=None):
+        '''Get the url of a results page linked from the browser current page,
+        the sites with several results pages override it.
+
+        :return: url or None
+        '''
+        return None
+
+    def _next(self, page):
+        url = self._next_url(page)
+        if url:
+            return self.browser.open(url)
+
+    def _prefetch_next(self, page, pages_max, prefetch=0):
+        '''Fetch the next results pages in the background.
+
+        :param prefetch: number of pages fetched ahead
+        '''
+        pages = range(page + 1, min(page + prefetch, pages_max) + 1)
+        if pages:
+            self.browser.prefetch(lambda browser, page: self._next_url(page, browser), pages)
 
     def save_cookie(self, cookie_file):
-        if self.cookie_jar:
+        if cookie_file and self.cookie_jar is not None:
             self.cookie_jar.save(cookie_file,
                     ignore_discard=False, ignore_expires=False)
 
+    def _is_logged(self):
+        '''Check if the current page is seen as a logged in user.
+        '''
+        return False
+
+    def _login(self, username, password):
+        '''Submit the login form, the sites with a login override it.
+
+        :return: True if logged in
+        '''
+        return False
+
+    def login(self, username, password):
+        '''Log in unless the shared session of the user is still valid.
+        '''
+        session = self.session
+        if session is None or not password:
+            return False
+        with session.lock:
+            if session.is_valid(self.SESSION_TTL):
+                return True
+            if session.has_cookies() and self.browser.open(self.url) \
+                    and self._is_logged():
+                session.validate()
+                return True
+            if not self._login(username, password):
+                session.clear()
+                return False
+            session.validate()
+            return True
+
     def get_link_text(self, val):
         res = RE_LINK_TITLE.search(val)
         if res:
@@ -238,32 +487,23 @@ class Base(object):
 
 
 def update_rate(name, count=None):
-    info = Work.get_info('rate', name)
-    if not info:
-        info = {'begin': datetime.utcnow(), 'count': 0}
-    elif count == -1:
-        delta = datetime.utcnow() - info['begin']
-        logger.info('reached %s rate limit after %s seconds', name, delta.seconds)
-
-    info['count'] = count or info['count'] + 1
-    Work.set_info('rate', name, info)
+    '''Count a request, or block the requests until the end
+    of the rate period if count is -1.
+    '''
+    if count == -1:
+        limiter.block(name)
+    else:
+        limiter.consume(name)
 
 def _validate_rate(name, limit, minutes):
-    info = Work.get_info('rate', name)
-    if info:
-        if datetime.utcnow() > info['begin'] + timedelta(minutes=minutes):
-            Work.set_info('rate', name, None)
-        elif info['count'] >= limit:
-            update_rate(name, count=-1)
-            return False
-        elif info['count'] == -1:
-            return False
-    return True
+    return limiter.allow(name)
 
 def throttle(limit=60, minutes=60):
     def decorator(func):
+        name = func.__module__.rsplit('.', 1)[-1]
+        limiter.configure(name, limit, minutes)
+
         def wrapper(*args, **kwargs):
-            name = func.__module__.rsplit('.', 1)[-1]
             if not _validate_rate(name, limit, minutes):
                 raise RateLimitReached('%s rate limit reached (%s requests / %s minutes)' % (name, limit, minutes))
             result = func(*args, **kwargs)
@@ -0,0 +1,179 @@
+import os
+import time
+import hashlib
+import cPickle as pickle
+from urllib import urlencode
+from urlparse import urlsplit, urlunsplit, parse_qsl
+from cStringIO import StringIO
+import mimetools
+import tempfile
+import logging
+
+import mechanize
+from mechanize._response import closeable_response
+
+
+CACHED_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/xml')
+EXCLUDED_HEADERS = ('set-cookie', 'set-cookie2')
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_url(url):
+    '''Get the url without fragment and with sorted query parameters.
+    '''
+    scheme, netloc, path, query, fragment = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+    return urlunsplit((scheme.lower(), netloc.lower(), path or '/', query, ''))
+
+
+class ResponseCache(object):
+    '''Responses cache storing bodies on local disk.
+    '''
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    def get_key(self, url, data=None):
+        key = normalize_url(url)
+        if data:
+            key += '\n%s' % data
+        return hashlib.sha1(key).hexdigest()
+
+    def _get_file(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def get(self, key):
+        file = self._get_file(key)
+        if not os.path.exists(file):
+            return
+        try:
+            with open(file, 'rb') as fd:
+                return pickle.load(fd)
+        except Exception, e:
+            logger.error('failed to load cache file %s: %s', file, str(e))
+
+    def set(self, key, entry):
+        file = self._get_file(key)
+        dir = os.path.dirname(file)
+        try:
+            if not os.path.exists(dir):
+                os.makedirs(dir)
+            fd, temp_file = tempfile.mkstemp(dir=dir)
+            with os.fdopen(fd, 'wb') as fd:
+                pickle.dump(entry, fd, pickle.HIGHEST_PROTOCOL)
+            os.rename(temp_file, file)
+        except Exception, e:
+            logger.error('failed to save cache file %s: %s', file, str(e))
+
+    def remove(self, key):
+        file = self._get_file(key)
+        if os.path.exists(file):
+            os.remove(file)
+
+    def purge(self, max_age):
+        '''Remove the entries older than max_age seconds.
+        '''
+        limit = time.time() - max_age
+        for path, dirs, files in os.walk(self.path):
+            for file in files:
+                file = os.path.join(path, file)
+                if os.stat(file).st_mtime < limit:
+                    os.remove(file)
+
+
+_cache = None
+
+
+def configure(path):
+    '''Enable the responses cache using the path directory.
+    '''
+    global _cache
+    _cache = ResponseCache(path) if path else None
+
+def get_cache():
+    return _cache
+
+
+def _get_response(entry, url):
+    headers = mimetools.Message(StringIO(entry['headers']))
+    return closeable_response(StringIO(entry['data']), headers, url,
+            entry['code'], entry['msg'])
+
+
+class CacheHandler(mechanize.BaseHandler):
+    '''Serve the cached responses of GET and POST requests,
+    revalidating the expired ones when they have an ETag or Last-Modified.
+    '''
+    handler_order = 450     # process responses before the errors handler
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+
+    def http_request(self, req):
+        req.cache_entry = None
+        req.cache_key = None
+        cache = get_cache()
+        if not cache:
+            return req
+
+        req.cache_key = cache.get_key(req.get_full_url(), req.get_data())
+        entry = cache.get(req.cache_key)
+        if entry:
+            req.cache_entry = entry
+            if time.time() - entry['stored'] > self.ttl:
+                entry['fresh'] = False
+                if entry.get('etag'):
+                    req.add_unredirected_header('If-None-Match', entry['etag'])
+                if entry.get('last_modified'):
+                    req.add_unredirected_header('If-Modified-Since', entry['last_modified'])
+            else:
+                entry['fresh'] = True
+        return req
+
+    def default_open(self, req):
+        entry = getattr(req, 'cache_entry', None)
+        if entry and entry['fresh']:
+            response = _get_response(entry, req.get_full_url())
+            response.from_cache = True
+            return response
+
+    def http_response(self, req, response):
+        cache = get_cache()
+        key = getattr(req, 'cache_key', None)
+        if not cache or not key or getattr(response, 'from_cache', False):
+            return response
+
+        entry = req.cache_entry
+        if response.code == 304 and entry:
+            entry['stored'] = time.time()
+            cache.set(key, entry)
+            response = _get_response(entry, req.get_full_url())
+            response.from_cache = True
+            return response
+
+        if response.code != 200:
+            return response
+        info = response.info()
+        content_type = (info.getheader('content-type') or '').split(';')[0].strip().lower()
+        if content_type not in CACHED_CONTENT_TYPES:
+            return response
+
+        data = response.read()
+        headers = ''.join([h for h in info.headers
+                if h.split(':', 1)[0].strip().lower() not in EXCLUDED_HEADERS])
+        cache.set(key, {
+                'data': data,
+                'headers': headers,
+                'code': response.code,
+                'msg': response.msg,
+                'etag': info.getheader('etag'),
+                'last_modified': info.getheader('last-modified'),
+                'stored': time.time(),
+                })
+        return closeable_response(StringIO(data), info,
+                response.geturl(), response.code, response.msg)
+
+    https_request = http_request
+    https_response = http_response
@@ -0,0 +1,107 @@
+import time
+import zlib
+import logging
+
+from mediacore.utils.deadline import check
+from mediacore.web.stats import add_timing, add_bytes
+
+
+ACCEPT_ENCODING = 'gzip, deflate'
+MAX_HTML_SIZE = 4 * 1024 * 1024     # decompressed bytes
+CHUNK_SIZE = 65536
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+logger = logging.getLogger(__name__)
+
+
+class Decoder(object):
+    '''Streaming gzip and deflate decoder.
+    '''
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding in ('gzip', 'x-gzip'):
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            self._decompressor = zlib.decompressobj()
+        self._first = True
+
+    def decompress(self, data, max_size=0):
+        if self._first and self.encoding == 'deflate':
+            self._first = False
+            try:
+                return self._decompressor.decompress(data, max_size)
+            except zlib.error:
+                # Some servers send raw deflate data without the zlib header
+                self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self._decompressor.decompress(data, max_size)
+
+    def flush(self):
+        return self._decompressor.flush()
+
+
+def get_decoder(encoding):
+    '''Get a streaming decoder for the content encoding
+    or None if the content is not encoded.
+    '''
+    encoding = (encoding or '').strip().lower()
+    if encoding in ('gzip', 'x-gzip', 'deflate'):
+        return Decoder(encoding)
+    if encoding and encoding != 'identity':
+        logger.error('unsupported content encoding "%s"', encoding)
+
+def is_html(headers):
+    content_type = headers.getheader('content-type') or ''
+    return content_type.split(';')[0].strip().lower() in HTML_CONTENT_TYPES
+
+def is_binary(headers):
+    '''Check if the content type is a binary download (torrent, archive, image, etc).
+    '''
+    content_type = (headers.getheader('content-type') or '').lower()
+    if not content_type or content_type.startswith('text/'):
+        return False
+    for type in ('html', 'xml', 'json', 'javascript'):
+        if type in content_type:
+            return False
+    return True
+
+def read(fileobj, headers, max_html_size=MAX_HTML_SIZE):
+    '''Read and decode the body, checking the current deadline between chunks.
+
+    The decompressed HTML pages are truncated to max_html_size bytes.
+    The headers are updated to match the decoded body.
+
+    :return: tuple (data, complete)
+    '''
+    decoder = get_decoder(headers.getheader('content-encoding'))
+    max_size = max_html_size if is_html(headers) else 0
+    chunks = []
+    size = 0
+    complete = True
+    while True:
+        check()
+        chunk = fileobj.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        add_bytes(len(chunk))
+        if decoder:
+            begin = time.time()
+            chunk = decoder.decompress(chunk, max_size - size + 1 if max_size else 0)
+            add_timing('decompress', time.time() - begin)
+        chunks.append(chunk)
+        size += len(chunk)
+        if max_size and size > max_size:
+            logger.info('truncated %s response to %s bytes', headers.getheader('content-type'), max_size)
+            complete = False
+            break
+
+    if complete and decoder:
+        chunks.append(decoder.flush())
+    data = ''.join(chunks)
+    if not complete:
+        data = data[:max_size]
+    if decoder:
+        del headers['content-encoding']
+    if 'content-length' in headers:
+        del headers['content-length']
+    headers['Content-Length'] = str(len(data))
+    return data, complete
@@ -0,0 +1,115 @@
+import time
+import random
+from threading import Lock, Condition
+import logging
+
+from systools.system import TimeoutError
+
+from mediacore.utils.deadline import check, remaining
+
+
+INITIAL_LIMIT = 4   # in-flight requests per host
+MIN_LIMIT = 1
+MAX_LIMIT = 16
+DECREASE_FACTOR = .5
+BACKOFF_MIN = 2     # seconds
+BACKOFF_MAX = 300   # seconds
+WAIT_STEP = 1   # seconds
+
+logger = logging.getLogger(__name__)
+
+
+class HostState(object):
+
+    def __init__(self, limit=INITIAL_LIMIT):
+        self.limit = float(limit)
+        self.inflight = 0
+        self.failures = 0
+        self.backoff_until = 0
+
+
+class Controller(object):
+    '''Per-host concurrency controller: the allowed in-flight requests
+    follow an additive-increase/multiplicative-decrease on the overload
+    signals, which also delay the next requests with a jittered
+    exponential backoff.
+    '''
+    def __init__(self, initial_limit=INITIAL_LIMIT):
+        self.initial_limit = initial_limit
+        self._hosts = {}
+        self._lock = Lock()
+        self._cond = Condition(self._lock)
+
+    def _get_state(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = HostState(self.initial_limit)
+        return self._hosts[host]
+
+    def acquire(self, host):
+        '''Wait for a request slot, within the current deadline.
+        Fail at once if the host backoff outlasts the deadline.
+        '''
+        with self._lock:
+            state = self._get_state(host)
+            while True:
+                check()
+                now = time.time()
+                if now >= state.backoff_until and state.inflight < int(state.limit):
+                    state.inflight += 1
+                    return
+                wait = WAIT_STEP
+                if now < state.backoff_until:
+                    backoff = state.backoff_until - now
+                    if backoff > remaining(backoff):
+                        raise TimeoutError('%s backing off for %.1f seconds' % (host, backoff))
+                    wait = min(wait, backoff)
+                self._cond.wait(min(wait, remaining(wait)) or .01)
+
+    def release(self, host, overloaded=False, retry_after=None, failed=False):
+        '''Free a request slot.
+
+        :param overloaded: the request got an overload signal
+        :param failed: the request failed, the limit is not increased
+        '''
+        with self._lock:
+            state = self._get_state(host)
+            state.inflight = max(0, state.inflight - 1)
+            if overloaded:
+                state.limit = max(MIN_LIMIT, state.limit * DECREASE_FACTOR)
+                state.failures += 1
+                if retry_after is None:
+                    delay = min(BACKOFF_MAX, BACKOFF_MIN * 2 ** (state.failures - 1))
+                    delay *= random.uniform(.5, 1.5)
+                else:
+                    delay = min(BACKOFF_MAX, retry_after)
+                state.backoff_until = max(state.backoff_until, time.time() + delay)
+                logger.info('%s overloaded, backing off %.1f seconds (%d in-flight requests allowed)',
+                        host, delay, int(state.limit))
+            elif not failed:
+                state.limit = min(MAX_LIMIT, state.limit + 1 / state.limit)
+                state.failures = 0
+            self._cond.notify_all()
+
+    def get_info(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state:
+                return {
+                    'limit': int(state.limit),
+                    'inflight': state.inflight,
+                    'failures': state.failures,
+                    'backoff': max(0, state.backoff_until - time.time()),
+                    }
+
+    def clear(self):
+        with self._lock:
+            self._hosts = {}
+
+
+controller = Controller()
+
+
+def get_retry_after(headers):
+    val = headers.getheader('retry-after') if headers else None
+    if val and val.strip().isdigit():
+        return int(val)
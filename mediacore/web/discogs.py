@@ -5,7 +5,9 @@ from requests.exceptions import ConnectionError
 
 import discogs_client as discogs
 
-from filetools.title import Title, clean
+from filetools.title import clean
+
+from mediacore.utils.title import get_search_re
 
 
 RE_DATE_ALBUM = re.compile(r'(\d{4})(-(\d{2})-(\d{2}))?$')
@@ -22,11 +24,11 @@ class Discogs(object):
             query = '%s %s' % (artist, album)
             params['type'] = 'master'
             params['album'] = album
-            re_name = Title(album).get_search_re()
+            re_name = get_search_re(album)
         else:
             query = artist
             params['type'] = 'artist'
-            re_name = Title(artist).get_search_re()
+            re_name = get_search_re(artist)
 
         try:
             for res in discogs.Search(query, **params).results():
@@ -19,17 +19,16 @@ class Google(Base):
     URL = 'http://www.google.com'
     ROBUST_FACTORY = True
 
-    def _next(self, page):
-        for link in self.browser.cssselect('#nav a'):
+    def _next_url(self, page, browser=None):
+        for link in (browser or self.browser).cssselect('#nav a', []):
             try:
                 page_ = int(clean(self.get_link_text(html.tostring(link))))
             except ValueError:
                 continue
             if page_ == page:
-                url = urljoin(self.url, link.get('href'))
-                return self.browser.open(url)
+                return urljoin(self.url, link.get('href'))
 
-    def results(self, query, pages_max=1):
+    def results(self, query, pages_max=1, prefetch=0):
         for page in range(1, pages_max + 1):
             if page > 1:
                 if not self._next(page):
@@ -37,6 +36,8 @@ class Google(Base):
             else:
                 self.browser.submit_form(self.url, fields={'q': query})
 
+            self._prefetch_next(page, pages_max, prefetch)
+
             for li in self.browser.cssselect('li.g', []):
                 log = html.tostring(li, pretty_print=True)[:1000]
 
@@ -4,11 +4,10 @@ import logging
 
 from lxml import html
 
-from filetools.title import Title, clean
+from filetools.title import clean
 
-from systools.system import timeout
-
-from mediacore.web import Base
+from mediacore.web import Base, timeout
+from mediacore.utils.title import get_search_re
 
 
 RE_URLS = {
@@ -30,6 +29,7 @@ logger = logging.getLogger(__name__)
 class Imdb(Base):
     URL = 'http://www.imdb.com'
     ROBUST_FACTORY = True
+    CACHE_TTL = 86400
 
     def _get_urls(self, query, type='title'):
         urls = []
@@ -39,7 +39,7 @@ class Imdb(Base):
             if RE_URLS[type].search(url):
                 urls = [url]
             else:
-                re_name = Title(query).get_search_re()
+                re_name = get_search_re(query)
                 for res in self.browser.cssselect('.result_text a', []):
                     if not re_name.search(clean(res.text)):
                         continue
@@ -190,6 +190,8 @@ class Imdb(Base):
 
     @timeout(120)
     def releases(self):
+        if not self.browser.open(self.url):
+            return
         for release_type, re_release in RE_RELEASES_URLS.items():
             if not self.browser.follow_link(text_regex=re_release):
                 logger.error('failed to get %s releases', release_type)
@@ -7,10 +7,13 @@ from mediacore.web.youtube import Youtube
 from mediacore.web.metacritic import Metacritic
 from mediacore.web.rottentomatoes import Rottentomatoes
 
-from filetools.title import Title
-
 from mediacore.utils.filter import validate_info
 from mediacore.utils.utils import randomize
+from mediacore.utils.tasks import run_tasks
+from mediacore.utils.title import get_title
+
+
+EXTRA_TIMEOUT = 180     # seconds
 
 
 class InfoError(Exception): pass
@@ -124,7 +127,7 @@ def similar_music(band, filters=None,
 def _get_obj_date(obj):
     date = None
     if obj.get('release'):
-        date = Title(obj['release']).date
+        date = get_title(obj['release']).date
     if not date:
         info = obj.get('info', {})
         if info.get('date'):
@@ -133,43 +136,72 @@ def _get_obj_date(obj):
             date = obj['date'].year
     return date
 
-def search_extra(obj):
+def search_extra(obj, timeout=EXTRA_TIMEOUT):
     '''Get an object extra info.
+
+    Independent lookups are processed concurrently and the extra info
+    found before the timeout is returned.
     '''
-    extra = {}
+    extra_prev = obj.get('extra', {})
 
-    def set_extra(key, val):
-        extra[key] = val or obj.get('extra', {}).get(key, {})
+    def get_extra(key, val):
+        return val or extra_prev.get(key, {})
 
     info = obj.get('info', {})
     category = info.get('subtype') or obj.get('category')
+    tasks = {}
 
     if category in ('movies', 'tv', 'anime'):
         if category in ('tv', 'anime'):
             name = info.get('name') or obj.get('name')
-            set_extra('tvrage', Tvrage().get_info(name))
-            date = extra.get('tvrage', {}).get('date')
+            tasks['tvrage'] = (lambda: get_extra('tvrage',
+                    Tvrage().get_info(name)), [])
+
+            def get_imdb(tvrage):
+                date = (tvrage or {}).get('date')
+                return get_extra('imdb', Imdb().get_info(name, year=date))
+
+            def get_trailer(imdb, tvrage):
+                date = (imdb or {}).get('date') or (tvrage or {}).get('date')
+                return get_extra('youtube', Youtube().get_trailer(name, date=date))
+
+            tasks['imdb'] = (get_imdb, ['tvrage'])
+            tasks['youtube'] = (get_trailer, ['imdb', 'tvrage'])
         else:
             name = info.get('full_name') or obj.get('name')
-            set_extra('rottentomatoes', Rottentomatoes().get_info(name))
             date = _get_obj_date(obj)
+            tasks['rottentomatoes'] = (lambda: get_extra('rottentomatoes',
+                    Rottentomatoes().get_info(name)), [])
+            tasks['imdb'] = (lambda: get_extra('imdb',
+                    Imdb().get_info(name, year=date)), [])
+
+            def get_trailer(imdb):
+                date_ = (imdb or {}).get('date') or date
+                return get_extra('youtube', Youtube().get_trailer(name, date=date_))
+
+            tasks['youtube'] = (get_trailer, ['imdb'])
 
-        set_extra('metacritic', Metacritic().get_info(name,
-                category=category))
-        set_extra('imdb', Imdb().get_info(name, year=date))
-        date = extra.get('imdb', {}).get('date') or date
-        set_extra('youtube', Youtube().get_trailer(name, date=date))
+        tasks['metacritic'] = (lambda: get_extra('metacritic',
+                Metacritic().get_info(name, category=category)), [])
 
     elif category == 'music':
         artist = info.get('artist') or obj.get('artist') or obj.get('name')
         if artist:
             album = info.get('album') or obj.get('album')
-            set_extra('sputnikmusic', Sputnikmusic().get_info(artist, album))
-            set_extra('lastfm', Lastfm().get_info(artist, album))
-            set_extra('discogs', Discogs().get_info(artist, album))
-            set_extra('youtube', Youtube().get_track(artist, album))
+            tasks['sputnikmusic'] = (lambda: get_extra('sputnikmusic',
+                    Sputnikmusic().get_info(artist, album)), [])
+            tasks['lastfm'] = (lambda: get_extra('lastfm',
+                    Lastfm().get_info(artist, album)), [])
+            tasks['discogs'] = (lambda: get_extra('discogs',
+                    Discogs().get_info(artist, album)), [])
+            tasks['youtube'] = (lambda: get_extra('youtube',
+                    Youtube().get_track(artist, album)), [])
             if album:
-                set_extra('metacritic', Metacritic().get_info(album,
-                        category=category, artist=artist))
+                tasks['metacritic'] = (lambda: get_extra('metacritic',
+                        Metacritic().get_info(album, category=category,
+                        artist=artist)), [])
 
+    extra = run_tasks(tasks, timeout=timeout)
+    for key in tasks:
+        extra[key] = get_extra(key, extra.get(key))
     return extra
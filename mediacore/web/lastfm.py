@@ -4,11 +4,10 @@ import logging
 
 from lxml import html
 
-from filetools.title import Title, clean
+from filetools.title import clean
 
-from systools.system import timeout
-
-from mediacore.web import Base
+from mediacore.web import Base, timeout
+from mediacore.utils.title import get_search_re
 
 
 MIN_ALBUM_TRACKS = 4
@@ -27,6 +26,7 @@ logger = logging.getLogger(__name__)
 class Lastfm(Base):
     URL = 'http://www.last.fm/music'
     ROBUST_FACTORY = True
+    CACHE_TTL = 86400
 
     def _clean_url(self, url):
         return url.replace(' ', '+')
@@ -41,7 +41,7 @@ class Lastfm(Base):
         url = self._get_results_url(artist)
         if not url:
             return
-        re_name = Title(artist).get_search_re()
+        re_name = get_search_re(artist)
         self.browser.open(url)
         for tag in self.browser.cssselect('.artistsWithInfo li', []):
             links = tag.cssselect('a')
@@ -150,7 +150,7 @@ class Lastfm(Base):
         if not album:
             return info
         if info:
-            re_album = Title(album).get_search_re()
+            re_album = get_search_re(album)
             for res in info['albums']:
                 if re_album.search(res['title']):
                     return res
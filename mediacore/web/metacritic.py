@@ -5,11 +5,10 @@ import logging
 
 from lxml import html
 
-from filetools.title import Title, clean
+from filetools.title import clean
 
-from systools.system import timeout
-
-from mediacore.web import Base, Browser
+from mediacore.web import Base, Browser, timeout
+from mediacore.utils.title import get_search_re
 
 
 URLS = {
@@ -34,7 +33,7 @@ class Metacritic(Base):
     URL = 'http://www.metacritic.com/'
 
     def _get_media_info(self, url):
-        browser = Browser()
+        browser = Browser(site=self.browser.site)
         browser.open(url)
 
         info = {}
@@ -61,8 +60,8 @@ class Metacritic(Base):
 
         info = {}
 
-        re_q = Title(query).get_search_re()
-        re_artist = Title(artist).get_search_re() if artist else None
+        re_q = get_search_re(query)
+        re_artist = get_search_re(artist) if artist else None
         for li in self.browser.cssselect('.search_results li.result', []):
             log = html.tostring(li, pretty_print=True)[:1000]
 
@@ -0,0 +1,121 @@
+import time
+from urlparse import urlparse
+from threading import Lock
+import logging
+
+
+MIRROR_TTL = 600    # seconds
+FAILURE_TTL = 60    # seconds
+
+logger = logging.getLogger(__name__)
+
+
+def _get_base(url):
+    res = urlparse(url)
+    return '%s://%s' % (res.scheme, res.netloc.lower())
+
+
+class MirrorCache(object):
+    '''Process-wide mirrors liveness and latency cache.
+    '''
+    def __init__(self, ttl=MIRROR_TTL, failure_ttl=FAILURE_TTL):
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self._mirrors = {}
+        self._lock = Lock()
+
+    def _is_fresh(self, info, now):
+        ttl = self.ttl if info['alive'] else self.failure_ttl
+        return now - info['checked'] < ttl
+
+    def record(self, url, alive, latency=None):
+        with self._lock:
+            self._mirrors[_get_base(url)] = {
+                'alive': alive,
+                'latency': latency,
+                'checked': time.time(),
+                }
+
+    def report_failure(self, url):
+        '''Mark the mirror serving the url as dead if it is a known mirror.
+        '''
+        base = _get_base(url)
+        with self._lock:
+            info = self._mirrors.get(base)
+            if info and info['alive']:
+                info['alive'] = False
+                info['checked'] = time.time()
+                logger.info('mirror %s is now considered dead', base)
+
+    def get_info(self, url):
+        with self._lock:
+            return dict(self._mirrors.get(_get_base(url), {}))
+
+    def _get_cached(self, urls):
+        now = time.time()
+        alive = []
+        to_probe = []
+        with self._lock:
+            for url in urls:
+                info = self._mirrors.get(_get_base(url))
+                if not info or not self._is_fresh(info, now):
+                    to_probe.append(url)
+                elif info['alive']:
+                    alive.append((info['latency'], url))
+        return alive, to_probe
+
+    def sort(self, urls):
+        '''Sort the urls by mirror health: the known alive mirrors
+        first (fastest first), then the unknown ones and the dead ones.
+        '''
+        now = time.time()
+        res = []
+        with self._lock:
+            for i, url in enumerate(urls):
+                info = self._mirrors.get(_get_base(url))
+                if not info or not self._is_fresh(info, now):
+                    rank = (1, 0)
+                elif info['alive']:
+                    rank = (0, info['latency'])
+                else:
+                    rank = (2, 0)
+                res.append((rank, i, url))
+        return [url for rank, i, url in sorted(res)]
+
+    def select(self, urls, probe):
+        '''Get the fastest healthy mirror from the urls list.
+
+        :param probe: callable taking a url and returning a true value
+            if the url is accessible, only called for mirrors
+            with no fresh info
+        '''
+        alive, to_probe = self._get_cached(urls)
+        if alive:
+            return sorted(alive)[0][1]
+
+        for url in to_probe:
+            begin = time.time()
+            res = probe(url)
+            self.record(url, alive=bool(res), latency=time.time() - begin)
+            if res:
+                return url
+
+    def clear(self):
+        with self._lock:
+            self._mirrors = {}
+
+
+mirrors = MirrorCache()
+
+
+def get_url(urls, probe):
+    return mirrors.select(urls, probe)
+
+def sort_urls(urls):
+    return mirrors.sort(urls)
+
+def record(url, alive, latency=None):
+    mirrors.record(url, alive, latency)
+
+def report_failure(url):
+    mirrors.report_failure(url)
@@ -5,11 +5,10 @@ import logging
 
 from lxml import html
 
-from filetools.title import Title, clean
+from filetools.title import clean
 
-from systools.system import timeout
-
-from mediacore.web import Base
+from mediacore.web import Base, timeout
+from mediacore.utils.title import get_search_re
 
 
 NETFLIX_CATEGORIES = {
@@ -29,8 +28,9 @@ class Netflix(Base):
 
     def __init__(self, username, password, cookie_file=None):
         self.cookie_file = cookie_file
-        super(Netflix, self).__init__(cookie_file=self.cookie_file)
-        self.logged = self._login(username, password) if self.url else False
+        super(Netflix, self).__init__(cookie_file=self.cookie_file,
+                username=username)
+        self.logged = self.login(username, password) if self.url else False
 
     def _is_logged(self):
         for form in self.browser.forms():
@@ -40,9 +40,6 @@ class Netflix(Base):
         return True
 
     def _login(self, username, password):
-        if self._is_logged():
-            return True
-
         fields = {'email': username, 'password': password}
         if not self.browser.submit_form(self.url, fields=fields):
             return False
@@ -58,7 +55,7 @@ class Netflix(Base):
         url = urljoin(self.url, '/WiSearch?%s' % urlencode({'v1': query}))
         self.browser.open(url)
 
-        re_q = Title(query).get_search_re()
+        re_q = get_search_re(query)
         for div in self.browser.cssselect('.mresult', []):
             log = html.tostring(div, pretty_print=True)[:1000]
 
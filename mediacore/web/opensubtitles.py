@@ -4,12 +4,13 @@ import logging
 
 from transfer.http import download as download_file
 
-from filetools.title import Title, clean
+from filetools.title import clean
 from filetools.media import (is_html, files, clean_file, move_file,
         remove_file, mkdtemp)
 from filetools.download import unpack_download
 
 from mediacore.web import Base, throttle, update_rate, RateLimitReached
+from mediacore.utils.title import get_search_re
 
 
 DEFAULT_LANG = 'eng'
@@ -24,18 +25,21 @@ class Opensubtitles(Base):
     URL = 'http://www.opensubtitles.org'
 
     def __init__(self, username, password):
-        super(Opensubtitles, self).__init__()
+        super(Opensubtitles, self).__init__(username=username)
         if self.url:
-            self.logged = self._login(username, password)
+            self.logged = self.login(username, password)
         else:
             self.logged = False
 
+    def _is_logged(self):
+        return 'loginform' not in [f.name for f in self.browser.forms()]
+
     def _login(self, username, password):
         fields = {'user': username, 'password': password}
         if not self.browser.submit_form(self.url,
                 name='loginform', fields=fields):
             return False
-        if 'loginform' in [f.name for f in self.browser.forms()]:
+        if not self._is_logged():
             logger.error('failed to login as %s', username)
             return False
         return True
@@ -104,9 +108,9 @@ class Opensubtitles(Base):
             return
 
         if season and episode:
-            re_name = Title(name).get_search_re(mode='__all__')
+            re_name = get_search_re(name, mode='__all__')
         else:
-            re_name = Title(name).get_search_re()
+            re_name = get_search_re(name)
 
         for res in self._subtitles_urls(re_name, date=date):
             for result in self._get_subtitles(res):
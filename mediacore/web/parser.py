@@ -0,0 +1,230 @@
+import re
+import time
+from collections import OrderedDict
+from threading import local, Lock
+import logging
+
+from lxml import etree, html
+from lxml.cssselect import CSSSelector
+
+
+FEED_SIZE = 16384
+
+logger = logging.getLogger(__name__)
+
+_local = local()
+_root_res = {}
+_schemas = {}
+
+
+def get_selector(expr, translator='html'):
+    '''Get a thread-local compiled CSS selector,
+    the XPath objects serializing their evaluations.
+    '''
+    if not hasattr(_local, 'selectors'):
+        _local.selectors = {}
+    key = (expr, translator)
+    selector = _local.selectors.get(key)
+    if selector is None:
+        selector = _local.selectors[key] = CSSSelector(expr, translator=translator)
+    return selector
+
+
+class SelectorMixin(object):
+
+    def cssselect(self, expr, translator='html'):
+        return get_selector(expr, translator)(self)
+
+
+class HtmlElement(SelectorMixin, html.HtmlElement):
+    pass
+
+
+class ElementClassLookup(html.HtmlElementClassLookup):
+    '''HTML elements lookup using the compiled selectors cache.
+    '''
+    def __init__(self):
+        html.HtmlElementClassLookup.__init__(self,
+                mixins=[('*', SelectorMixin)])
+
+    def lookup(self, node_type, document, namespace, name):
+        if node_type == 'element':
+            return self._element_classes.get(name.lower(), HtmlElement)
+        return html.HtmlElementClassLookup.lookup(self,
+                node_type, document, namespace, name)
+
+
+def _get_parser(encoding=None):
+    '''Get a thread-local HTML parser for the encoding.
+    '''
+    if not hasattr(_local, 'parsers'):
+        _local.parsers = {}
+    parser = _local.parsers.get(encoding)
+    if parser is None:
+        try:
+            parser = html.HTMLParser(encoding=encoding, remove_comments=True)
+        except LookupError:
+            logger.error('unknown encoding "%s"', encoding)
+            return _get_parser()
+        parser.set_element_class_lookup(ElementClassLookup())
+        _local.parsers[encoding] = parser
+    return parser
+
+def _get_root_re(root):
+    if root not in _root_res:
+        tag, id = root
+        _root_res[root] = re.compile(r'<%s\b[^>]*\bid=["\']?%s\b' % (tag, re.escape(id)), re.I)
+    return _root_res[root]
+
+def _get_subtree(data, encoding, root):
+    '''Parse the data from the root element start tag
+    until the root element is complete.
+
+    :param root: tuple (tag, id)
+
+    :return: the root element or None if not found
+    '''
+    res = _get_root_re(root).search(data)
+    if not res:
+        return None
+
+    tag, id = root
+    try:
+        parser = etree.HTMLPullParser(events=('end',),
+                encoding=encoding, remove_comments=True)
+    except LookupError:
+        parser = etree.HTMLPullParser(events=('end',), remove_comments=True)
+    parser.set_element_class_lookup(ElementClassLookup())
+
+    # The pull parser tag filter delays the events until the parser is closed
+    for i in range(res.start(), len(data), FEED_SIZE):
+        parser.feed(data[i:i + FEED_SIZE])
+        for event, element in parser.read_events():
+            if element.tag == tag and element.get('id') == id:
+                return element
+    parser.close()
+
+def get_tree(data, encoding=None, root=None):
+    '''Parse the raw HTML data and drop the script elements.
+
+    :param encoding: declared charset
+    :param root: optional tuple (tag, id) of the element to return,
+        the parsing starts at its start tag and stops once it is complete,
+        the whole data is parsed if the element is not found
+    '''
+    tree = _get_subtree(data, encoding, root) if root else None
+    if tree is None:
+        tree = html.fromstring(data, parser=_get_parser(encoding))
+    etree.strip_elements(tree, 'script', with_tail=False)
+    return tree
+
+
+class Field(object):
+    '''Row field extracted from the first element matching the selector.
+
+    :param selector: CSS selector relative to the row,
+        None for the row itself
+    :param value: 'text', 'element' or '@attribute'
+    :param convert: optional callable applied to the value
+    :param required: skip the row if the value is missing
+        or its conversion fails
+    '''
+    def __init__(self, selector=None, value='text', convert=None,
+            required=True):
+        self.selector = selector
+        self.value = value
+        self.convert = convert
+        self.required = required
+
+    def get(self, row):
+        if self.selector:
+            res = row.cssselect(self.selector)
+            if not res:
+                return None
+            row = res[0]
+        if self.value == 'text':
+            val = row.text
+        elif self.value == 'element':
+            val = row
+        else:
+            val = row.get(self.value.lstrip('@'))
+        if val is not None and self.convert:
+            val = self.convert(val)
+        return val
+
+
+class FieldStats(object):
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.duration = 0
+
+
+class Schema(object):
+    '''Declarative extraction of the rows of a page
+    as dicts of the fields values, timing each field.
+
+    :param selector: CSS selector of the rows
+    :param fields: list of tuples (name, Field), the required fields
+        are checked in order
+    '''
+    def __init__(self, name, selector, fields):
+        self.name = name
+        self.selector = selector
+        self.fields = OrderedDict(fields)
+        self._stats = dict([(k, FieldStats()) for k in self.fields])
+        self._lock = Lock()
+        _schemas[name] = self
+
+    def select(self, tree):
+        return tree.cssselect(self.selector)
+
+    def extract(self, row):
+        '''Get the fields values of a row.
+
+        :return: dict or None if a required field is missing
+        '''
+        res = {}
+        for name, field in self.fields.items():
+            begin = time.time()
+            try:
+                val = field.get(row)
+            except Exception, e:
+                logger.debug('failed to get %s %s: %s', self.name, name, str(e))
+                val = None
+            duration = time.time() - begin
+            with self._lock:
+                stats = self._stats[name]
+                stats.count += 1
+                stats.duration += duration
+                if val is None:
+                    stats.errors += 1
+            if val is None and field.required:
+                return None
+            res[name] = val
+        return res
+
+    def extract_all(self, tree):
+        '''Get the fields values of the complete rows of a page.
+        '''
+        res = []
+        for row in self.select(tree):
+            info = self.extract(row)
+            if info is not None:
+                res.append(info)
+        return res
+
+    def get_stats(self):
+        with self._lock:
+            return dict([(k, {
+                    'count': v.count,
+                    'errors': v.errors,
+                    'duration': v.duration,
+                    }) for k, v in self._stats.items()])
+
+
+def get_stats():
+    '''Get the fields extraction stats of the schemas.
+    '''
+    return dict([(k, v.get_stats()) for k, v in _schemas.items()])
@@ -0,0 +1,208 @@
+import time
+import zlib
+import socket
+import httplib
+from urllib2 import URLError
+from cStringIO import StringIO
+from threading import Lock
+import logging
+
+import mechanize
+from mechanize._response import closeable_response
+
+from systools.system import TimeoutError
+
+from mediacore.web.compression import read
+from mediacore.web.stats import add_timing
+
+
+POOL_SIZE = 4   # idle connections kept per host
+IDLE_TIMEOUT = 60   # seconds
+CONNECT_TIMEOUT = 10    # seconds
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool(object):
+    '''Process-wide pool of persistent HTTP connections, per host.
+    '''
+    def __init__(self, size=POOL_SIZE, idle_timeout=IDLE_TIMEOUT):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._idle = {}
+        self._stats = {}
+        self._lock = Lock()
+
+    def _get_stats(self, key):
+        host = '%s://%s' % key
+        if host not in self._stats:
+            self._stats[host] = {
+                'connections': 0,
+                'reused': 0,
+                'requests': 0,
+                'errors': 0,
+                'expired': 0,
+                }
+        return self._stats[host]
+
+    def get(self, key, factory):
+        '''Get an idle connection for the (scheme, host) key
+        or create a new one using factory.
+
+        :return: tuple (connection, reused)
+        '''
+        expired = []
+        conn = None
+        with self._lock:
+            stats = self._get_stats(key)
+            stats['requests'] += 1
+            idle = self._idle.get(key, [])
+            now = time.time()
+            while idle:
+                conn_, released = idle.pop()
+                if now - released > self.idle_timeout:
+                    expired.append(conn_)
+                    stats['expired'] += 1
+                else:
+                    conn = conn_
+                    stats['reused'] += 1
+                    break
+            if conn is None:
+                stats['connections'] += 1
+
+        for conn_ in expired:
+            conn_.close()
+        if conn is not None:
+            return conn, True
+        return factory(), False
+
+    def put(self, key, conn):
+        '''Release a connection after its response has been read.
+        '''
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.size:
+                idle.append((conn, time.time()))
+                return
+        conn.close()
+
+    def discard(self, key, conn, error=False):
+        if error:
+            with self._lock:
+                self._get_stats(key)['errors'] += 1
+        conn.close()
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn, released in conns:
+                conn.close()
+
+    def stats(self, host=None):
+        '''Get the pool stats.
+
+        :param host: host url (e.g.: 'http://torrentz.eu')
+        '''
+        with self._lock:
+            res = {}
+            for key, stats in self._stats.items():
+                res[key] = dict(stats)
+            for key, idle in self._idle.items():
+                res['%s://%s' % key]['idle'] = len(idle)
+        return res.get(host, {}) if host else res
+
+
+pool = ConnectionPool()
+
+
+def _is_stale(error, sent, data=None):
+    '''Check if a request failed on a reused connection
+    because the server closed it while idle.
+
+    :param sent: the request was sent and no response was received
+    '''
+    if isinstance(error, socket.timeout):
+        return False
+    if not sent:
+        return True
+    # The server might have processed the request
+    return not data and isinstance(error, (httplib.BadStatusLine, socket.error))
+
+
+class KeepAliveMixin:
+
+    def _keepalive_open(self, http_class, req):
+        host = req.get_host()
+        if not host:
+            raise URLError('no host given')
+        if req._tunnel_host:
+            return self.do_open(http_class, req)
+
+        key = (req.get_type(), host)
+        headers = dict(req.headers)
+        headers.update(req.unredirected_hdrs)
+        headers = dict((name.title(), val) for name, val in headers.items())
+        headers['Connection'] = 'keep-alive'
+        timeout = req.timeout if isinstance(req.timeout, (int, float)) else None
+        connect_timeout = min(timeout, CONNECT_TIMEOUT) if timeout else CONNECT_TIMEOUT
+
+        def factory():
+            return http_class(host, timeout=connect_timeout)
+
+        while True:
+            conn, reused = pool.get(key, factory)
+            conn.set_debuglevel(self._debuglevel)
+            sent = received = False
+            try:
+                if not conn.sock:
+                    begin = time.time()
+                    conn.connect()
+                    add_timing('connect', time.time() - begin)
+                if timeout:
+                    conn.sock.settimeout(timeout)
+                begin = time.time()
+                conn.request(req.get_method(), req.get_selector(), req.data, headers)
+                sent = True
+                response = conn.getresponse()
+                received = True
+                add_timing('ttfb', time.time() - begin)
+                begin = time.time()
+                data, complete = read(response, response.msg)
+                add_timing('download', time.time() - begin)
+            except TimeoutError:
+                pool.discard(key, conn)
+                raise
+            except zlib.error, e:
+                pool.discard(key, conn, error=True)
+                raise URLError('failed to decode the response: %s' % str(e))
+            except (socket.error, httplib.HTTPException), e:
+                pool.discard(key, conn, error=not reused)
+                if reused and not received and _is_stale(e, sent, req.data):
+                    continue
+                raise URLError(e)
+
+            if response.will_close or not complete:
+                pool.discard(key, conn)
+            else:
+                pool.put(key, conn)
+            return closeable_response(StringIO(data), response.msg,
+                    req.get_full_url(), response.status, response.reason)
+
+
+class HTTPHandler(KeepAliveMixin, mechanize.HTTPHandler):
+
+    def http_open(self, req):
+        return self._keepalive_open(httplib.HTTPConnection, req)
+
+
+class HTTPSHandler(KeepAliveMixin, mechanize.HTTPSHandler):
+
+    def https_open(self, req):
+        if self.client_cert_manager is not None:
+            return mechanize.HTTPSHandler.https_open(self, req)
+        return self._keepalive_open(httplib.HTTPSConnection, req)
+
+
+def get_stats(host=None):
+    return pool.stats(host)
@@ -0,0 +1,161 @@
+import time
+import calendar
+from threading import RLock
+import atexit
+import logging
+
+from pymongo.errors import OperationFailure
+
+from mediacore.model.work import Work
+
+
+SECTION = 'rate'
+WINDOW_BUCKETS = 6  # sub-windows of the sliding window
+LEASE_RATIO = .05   # part of the limit reserved by a worker at once
+
+logger = logging.getLogger(__name__)
+
+
+class Lease(object):
+    '''Tokens reserved in the shared window, usable until expires.
+    '''
+    def __init__(self, name, bucket, tokens=0, expires=0):
+        self.name = name
+        self.bucket = bucket
+        self.tokens = tokens
+        self.expires = expires
+
+    def is_valid(self, now):
+        return self.tokens > 0 and now < self.expires
+
+
+def _get_blocked_until(info, period):
+    if 'count' in info:     # fixed window state
+        if info['count'] == -1:
+            return calendar.timegm(info['begin'].utctimetuple()) + period
+        return None
+    return info.get('blocked_until')
+
+
+class RateLimiter(object):
+    '''Sliding window rate limits shared by the workers processes.
+
+    Each site window is split in buckets counted in the work collection
+    with atomic increments. A worker reserves a lease of a few tokens
+    in the current bucket, and makes the next decisions in memory
+    until the lease is used or the bucket ends.
+    '''
+    def __init__(self, buckets=WINDOW_BUCKETS, lease_ratio=LEASE_RATIO):
+        self.buckets = buckets
+        self.lease_ratio = lease_ratio
+        self._limits = {}
+        self._leases = {}
+        self._denied = {}
+        self._lock = RLock()
+
+    def configure(self, name, limit, minutes):
+        with self._lock:
+            self._limits[name] = (limit, minutes)
+
+    def _inc(self, name, bucket, value):
+        key = '%s.%s' % (name, bucket)
+        try:
+            info = Work.inc_info(SECTION, key, value)
+        except OperationFailure:    # reset fixed window state
+            Work.unset_info(SECTION, [name])
+            info = Work.inc_info(SECTION, key, value)
+        return info.get(name, {})
+
+    def _acquire(self, name, now):
+        limit, minutes = self._limits[name]
+        period = minutes * 60
+        size = float(period) / self.buckets
+        bucket = int(now // size)
+        tokens = max(1, int(limit * self.lease_ratio))
+
+        info = self._inc(name, bucket, tokens)
+        blocked_until = _get_blocked_until(info, period)
+        if blocked_until and now < blocked_until:
+            self._inc(name, bucket, -tokens)
+            self._denied[name] = blocked_until
+            return None
+
+        count = 0
+        stale = []
+        for key, val in info.items():
+            if not key.isdigit():
+                if key != 'blocked_until':
+                    stale.append(key)
+            elif int(key) > bucket - self.buckets:
+                count += val
+            else:
+                stale.append(key)
+        if stale:
+            Work.unset_info(SECTION, ['%s.%s' % (name, key) for key in stale])
+
+        excess = min(tokens, count - limit)
+        if excess > 0:
+            self._inc(name, bucket, -excess)
+            tokens -= excess
+            if not tokens:
+                # The window only changes when the bucket ends
+                self._denied[name] = (bucket + 1) * size
+                return None
+        return Lease(name, bucket, tokens, (bucket + 1) * size)
+
+    def allow(self, name):
+        with self._lock:
+            now = time.time()
+            if now < self._denied.get(name, 0):
+                return False
+            lease = self._leases.get(name)
+            if not lease or not lease.is_valid(now):
+                lease = self._acquire(name, now)
+                if not lease:
+                    return False
+                self._leases[name] = lease
+            return True
+
+    def consume(self, name):
+        with self._lock:
+            lease = self._leases.get(name)
+            if lease and lease.tokens > 0:
+                lease.tokens -= 1
+
+    def block(self, name):
+        '''Deny the requests of all the workers for a whole period.
+        '''
+        with self._lock:
+            if name not in self._limits:
+                logger.error('unknown rate limit "%s"', name)
+                return
+            limit, minutes = self._limits[name]
+            now = time.time()
+            blocked_until = now + minutes * 60
+            if now >= self._denied.get(name, 0):
+                logger.info('reached %s rate limit', name)
+            self._denied[name] = blocked_until
+            self._leases.pop(name, None)
+        Work.set_info(SECTION, '%s.blocked_until' % name, blocked_until)
+
+    def release(self):
+        '''Give back the unused tokens of the valid leases.
+        '''
+        with self._lock:
+            leases, self._leases = self._leases, {}
+        now = time.time()
+        for lease in leases.values():
+            if lease.is_valid(now):
+                try:
+                    self._inc(lease.name, lease.bucket, -lease.tokens)
+                except Exception, e:
+                    logger.error('failed to release %s rate limit lease: %s', lease.name, str(e))
+
+    def reset(self):
+        with self._lock:
+            self._leases = {}
+            self._denied = {}
+
+
+limiter = RateLimiter()
+atexit.register(limiter.release)
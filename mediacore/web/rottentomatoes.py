@@ -4,11 +4,10 @@ import logging
 
 from lxml import html
 
-from filetools.title import Title, clean
+from filetools.title import clean
 
-from systools.system import timeout
-
-from mediacore.web import Base, Browser
+from mediacore.web import Base, Browser, timeout
+from mediacore.utils.title import get_search_re
 
 
 URLS = {
@@ -25,7 +24,7 @@ class Rottentomatoes(Base):
     URL = 'http://www.rottentomatoes.com/'
 
     def _get_thumbnail_url(self, url):
-        browser = Browser()
+        browser = Browser(site=self.browser.site)
         browser.open(url)
         img_ = browser.cssselect('.movie_poster_area img')
         if img_:
@@ -41,7 +40,7 @@ class Rottentomatoes(Base):
 
         info = {}
 
-        re_q = Title(query).get_search_re()
+        re_q = get_search_re(query)
         for li in self.browser.cssselect('#movie_results_ul li', []):
             log = html.tostring(li, pretty_print=True)[:1000]
 
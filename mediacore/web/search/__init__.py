@@ -1,18 +1,38 @@
 import os
 import re
+import time
+import hashlib
+import heapq
+from collections import OrderedDict
+from Queue import Queue, Empty
+from threading import Thread, Event, BoundedSemaphore, Lock
 import logging
 
-from filetools.title import Title, clean, get_size
+from filetools.title import clean, get_size
 from filetools.utils import in_range
 
 from systools.system import dotdict
 
 from mediacore.model.settings import Settings
+from mediacore.model.cache import SearchCache
+from mediacore.model.work import Work
 from mediacore.web import update_rate, RateLimitReached
-from mediacore.utils.utils import list_in, parse_magnet_url
+from mediacore.web.cache import normalize_url
+from mediacore.utils.utils import parse_magnet_url
+from mediacore.utils.deadline import deadline
+from mediacore.utils.title import get_title
 
 
 PLUGINS_DIR = 'plugins'
+WORKERS = 4
+PLUGIN_TIMEOUT = 300    # seconds
+SETTINGS_TTL = 300  # seconds
+OBJECT_TTL = 1800   # seconds
+DEDUPE_SIZE = 10000     # results
+RESULTS_TTL = 1800  # seconds, plugins can set their own RESULTS_TTL
+HWM_SECTION = 'hwm'
+HWM_MARGIN = 10     # consecutive older results before stopping a search
+RE_UNSAFE_PATTERN = re.compile(r'\\\d|\(\?P')
 
 logger = logging.getLogger(__name__)
 
@@ -21,48 +41,182 @@ class LoginError(Exception): pass
 class SearchError(Exception): pass
 
 
+def _get_regexes(val, all=False):
+    '''Get the compiled patterns, combined in a single regex matching
+    any of the patterns or all the patterns if all is True.
+    '''
+    if not isinstance(val, (tuple, list)):
+        val = [val]
+    res = []
+    for val_ in val:
+        if not val_:
+            continue
+        if isinstance(val_, (str, unicode)):
+            val_ = re.compile(val_, re.I)
+        res.append(val_)
+    if len(res) < 2:
+        return res
+
+    # Keep the patterns with backreferences or named groups separate
+    flags = set([r.flags for r in res])
+    if len(flags) > 1 or [r for r in res if RE_UNSAFE_PATTERN.search(r.pattern)]:
+        return res
+    if all:
+        pattern = r'\A' + ''.join([r'(?=[\s\S]*?(?:%s))' % r.pattern for r in res])
+    else:
+        pattern = '|'.join(['(?:%s)' % r.pattern for r in res])
+    return [re.compile(pattern, flags.pop())]
+
+def _get_patterns(val):
+    if not isinstance(val, (tuple, list)):
+        val = [val]
+    return tuple([getattr(v, 'pattern', v) for v in val if v])
+
+def _match(val, include, exclude):
+    for re_ in include:
+        if not re_.search(val):
+            return False
+    for re_ in exclude:
+        if re_.search(val):
+            return False
+    return True
+
+def get_magnet_hash(url):
+    res = parse_magnet_url(url)
+    if res and 'xt' in res:
+        return res['xt'][0].split(':')[-1].lower() or None
+
+
+class ResultFilter(object):
+    '''Result filters compiled once per search (see Result.validate()),
+    with a single regex for the include or exclude patterns.
+    '''
+    def __init__(self, include_raw=None, exclude_raw=None, include=None,
+            exclude=None, langs=None, size_min=None, size_max=None, **kwargs):
+        self.key = (_get_patterns(include_raw), _get_patterns(exclude_raw),
+                _get_patterns(include), _get_patterns(exclude),
+                tuple(sorted(langs)) if langs else None, size_min, size_max)
+        self.include_raw = _get_regexes(include_raw, all=True)
+        self.exclude_raw = _get_regexes(exclude_raw)
+        self.include = _get_regexes(include, all=True)
+        self.exclude = _get_regexes(exclude)
+        self.langs = set(langs) if langs else None
+        self.size_min = size_min
+        self.size_max = size_max
+
+    def _validate_size(self, result):
+        return result.size is None or in_range(result.size, self.size_min, self.size_max)
+
+    def _validate_title(self, result):
+        if not _match(result.title, self.include_raw, self.exclude_raw):
+            return False
+        if (self.include or self.exclude) and not _match(
+                result.get_title().full_name, self.include, self.exclude):
+            return False
+        if self.langs and not self.langs.intersection(result.get_title().langs):
+            return False
+        return True
+
+    def validate(self, result):
+        return self._validate_size(result) and self._validate_title(result)
+
+    def filter(self, results):
+        '''Validate a page of results, the cheap size checks first.
+
+        :return: the valid results in their original order
+        '''
+        results = list(results)
+        mask = [self._validate_size(r) for r in results]
+        for i, result in enumerate(results):
+            if mask[i]:
+                mask[i] = self._validate_title(result)
+        return [r for r, valid in zip(results, mask) if valid]
+
+
 class Result(dotdict):
 
     def __init__(self):
         init = {'safe': True, 'auto': True}
         super(Result, self).__init__(init)
+        object.__setattr__(self, '_deferred', {})
 
-    def _get_regex(self, val):
-        if isinstance(val, (str, unicode)):
-            return re.compile(val, re.I)
-        return val
+    def __missing__(self, key):
+        if self._resolve(key) and key in self:
+            return dict.__getitem__(self, key)
+        raise KeyError(key)
 
-    def _validate_title(self, include=None, exclude=None, clean=True):
-        title = Title(self.title).full_name if clean else self.title
+    def __getattr__(self, attr):
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        return self.get(attr)
 
-        if include:
-            if not isinstance(include, (tuple, list)):
-                include = [include]
-            for include_ in include:
-                if include_ and not self._get_regex(include_).search(title):
-                    return False
+    def get(self, key, default=None):
+        if key not in self:
+            self._resolve(key)
+        return super(Result, self).get(key, default)
 
-        if exclude:
-            if not isinstance(exclude, (tuple, list)):
-                exclude = [exclude]
-            for exclude_ in exclude:
-                if exclude_ and self._get_regex(exclude_).search(title):
-                    return False
+    def defer(self, keys, resolver, *args):
+        '''Resolve the keys values on first access.
 
+        :param resolver: callable taking args and returning a dict
+            of the keys values or None if the resolution failed
+        '''
+        info = (resolver, args)
+        for key in keys:
+            self._deferred[key] = info
+
+    def get_deferred(self):
+        '''Get the pending deferred values as (keys, resolver, args) tuples.
+        '''
+        res = {}
+        for key, info in self.__dict__.get('_deferred', {}).items():
+            if info is not None:
+                res.setdefault(id(info), (info, []))[1].append(key)
+        return [(sorted(keys), info[0], info[1]) for info, keys in res.values()]
+
+    def is_deferred(self, key):
+        return self.__dict__.get('_deferred', {}).get(key) is not None
+
+    def _resolve(self, key):
+        if not self.is_deferred(key):
+            return False
+        deferred = self._deferred
+        info = deferred[key]
+        keys = [k for k, v in deferred.items() if v is info]
+        for k in keys:
+            deferred[k] = None  # resolved
+
+        resolver, args = info
+        try:
+            values = resolver(*args) or {}
+        except Exception, e:
+            logger.error('failed to resolve %s from %s: %s', ', '.join(keys), args, str(e))
+            values = {}
+        for k in keys:
+            if k not in self:
+                dict.__setitem__(self, k, values.get(k))
         return True
 
-    def _validate_lang(self, langs):
-        if not langs or list_in(langs, Title(self.title).langs, all=False):
-            return True
+    def resolve(self):
+        '''Resolve all the deferred values.
 
-    def _validate_size(self, size_min=None, size_max=None):
-        if self.size is None or in_range(self.size, size_min, size_max):
-            return True
+        :return: True if all the deferred values are set
+        '''
+        keys = self.__dict__.get('_deferred', {}).keys()
+        for key in keys:
+            self._resolve(key)
+        return all([self.get(k) is not None for k in keys])
+
+    def get_title(self):
+        '''Get the parsed title, shared by the results with the same title.
+        '''
+        return get_title(self.get('title'))
 
     def validate(self, **kwargs):
         '''Validate the result attributes.
 
         :param kwargs: filters
+            - filter: ResultFilter object, used instead of the next filters
             - include_raw: regex the raw title must match
             - exclude_raw: regex the raw title must not match
             - include: regex the title must match
@@ -71,15 +225,8 @@ class Result(dotdict):
             - size_min: minimum size in MB
             - size_max: maximum size in MB
         '''
-        if not self._validate_title(kwargs.get('include_raw'), kwargs.get('exclude_raw'), clean=False):
-            return
-        if not self._validate_title(kwargs.get('include'), kwargs.get('exclude')):
-            return
-        if not self._validate_lang(kwargs.get('langs')):
-            return
-        if not self._validate_size(kwargs.get('size_min'), kwargs.get('size_max')):
-            return
-        return True
+        filter_ = kwargs.get('filter') or ResultFilter(**kwargs)
+        return filter_.validate(self)
 
     def get_size(self, val):
         '''Get the result size in MB.
@@ -93,12 +240,10 @@ class Result(dotdict):
         if not self.url:
             logger.error('failed to get hash from result %s', self)
         else:
-            res = parse_magnet_url(self.url)
-            if res and 'xt' in res:
-                hash_ = res['xt'][0].split(':')[-1].lower()
-                if hash_:
-                    self.hash = hash_
-                    return True
+            hash_ = get_magnet_hash(self.url)
+            if hash_:
+                self.hash = hash_
+                return True
             logger.error('failed to get hash from magnet url "%s"', self.url)
 
 
@@ -126,11 +271,10 @@ def _get_plugins():
 
     return [name for i, name in sorted(res)]
 
-def _get_plugin_object(plugin):
+def _get_plugin_object(plugin, args):
     module_ = _get_module(plugin)
     if not module_:
         return None
-    args = Settings.get_settings(plugin)
     try:
         object_ = getattr(module_, plugin.capitalize())(**args)
     except Exception, e:
@@ -140,40 +284,564 @@ def _get_plugin_object(plugin):
         return None
     return object_
 
+
+class PluginRegistry(object):
+    '''Plugins discovered once, with cached settings
+    and a pool of initialized objects reused by the searches.
+    '''
+    def __init__(self, settings_ttl=SETTINGS_TTL, object_ttl=OBJECT_TTL,
+            pool_size=WORKERS):
+        self.settings_ttl = settings_ttl
+        self.object_ttl = object_ttl
+        self.pool_size = pool_size
+        self._plugins = None
+        self._settings = {}
+        self._idle = {}
+        self._lock = Lock()
+
+    def get_plugins(self):
+        '''Get the plugins names sorted by priority.
+        '''
+        with self._lock:
+            if self._plugins is None:
+                self._plugins = _get_plugins()
+            return list(self._plugins)
+
+    def get_settings(self, plugin):
+        with self._lock:
+            settings, updated = self._settings.get(plugin, (None, 0))
+        if time.time() - updated > self.settings_ttl:
+            settings = Settings.get_settings(plugin)
+            with self._lock:
+                self._settings[plugin] = (settings, time.time())
+        return settings
+
+    def acquire(self, plugin):
+        '''Get an idle plugin object or create a new one.
+        '''
+        settings = self.get_settings(plugin)
+        now = time.time()
+        with self._lock:
+            idle = self._idle.get(plugin, [])
+            while idle:
+                object_, settings_, created = idle.pop()
+                if settings_ == settings and now - created < self.object_ttl:
+                    return object_
+        object_ = _get_plugin_object(plugin, settings)
+        if object_:
+            object_._registry_info = (settings, now)
+        return object_
+
+    def release(self, plugin, object_, discard=False):
+        '''Give back a plugin object after a search.
+
+        :param discard: True if the object must not be reused
+        '''
+        if discard:
+            return
+        settings, created = object_._registry_info
+        with self._lock:
+            idle = self._idle.setdefault(plugin, [])
+            if len(idle) < self.pool_size:
+                idle.append((object_, settings, created))
+
+    def invalidate(self, plugin=None):
+        '''Drop the cached settings and objects, so they are
+        loaded again by the next searches.
+        '''
+        with self._lock:
+            if plugin:
+                self._settings.pop(plugin, None)
+                self._idle.pop(plugin, None)
+            else:
+                self._plugins = None
+                self._settings = {}
+                self._idle = {}
+
+
+registry = PluginRegistry()
+
+
+def validate_many(results, filter=None, **kwargs):
+    '''Validate a page of results at once, so the plugins only
+    fetch the details of the valid results.
+
+    :param filter: ResultFilter object
+    :param kwargs: filters used if filter is None (see Result.validate())
+
+    :return: the valid results in their original order
+    '''
+    return (filter or ResultFilter(**kwargs)).filter(results)
+
+def resolve(results, workers=WORKERS):
+    '''Resolve the deferred values of the results in parallel,
+    e.g.: for the results selected by top_results().
+
+    :return: the results list, without the results which failed to resolve
+    '''
+    results = [r for r in results if r is not None]
+    queue = Queue()
+    for i in range(len(results)):
+        queue.put(i)
+    resolved = [False] * len(results)
+
+    def worker():
+        while True:
+            try:
+                i = queue.get_nowait()
+            except Empty:
+                return
+            resolved[i] = results[i].resolve()
+
+    threads = [Thread(target=worker) for i in range(min(workers, len(results)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [r for r, res in zip(results, resolved) if res]
+
 def get_query(query, category=None):
     query = clean(query, 1)
     if category == 'tv':
-        query = Title(query).name
+        query = get_title(query).name
     elif category == 'anime':
-        query = Title(query).display_name
+        query = get_title(query).display_name
 
     query = re.sub(r'[\W_]+|\s+s\s+|\sand\s|\sor\s|\snot\s', ' ', query)
     query = re.sub(r'^the\s+|^[\W_]+|[\W_]+$', '', query)
     return query
 
-def results(query, plugins=None, **kwargs):
-    if not plugins:
-        plugins = _get_plugins()
+def _get_cache_key(plugin, query, kwargs):
+    filter_ = kwargs.get('filter') or ResultFilter(**kwargs)
+    key = (plugin, query, kwargs.get('category'), kwargs.get('sort'),
+            kwargs.get('pages_max'), filter_.key)
+    return hashlib.sha1(repr(key)).hexdigest()
 
-    for plugin in plugins:
-        obj = _get_plugin_object(plugin)
-        if not obj:
+def _get_results_ttl(plugin):
+    module_ = _get_module(plugin)
+    return getattr(module_, 'RESULTS_TTL', RESULTS_TTL) if module_ else 0
+
+def _resolve_plugin(plugin, name, *args):
+    obj = registry.acquire(plugin)
+    if obj:
+        try:
+            return getattr(obj, name)(*args)
+        finally:
+            registry.release(plugin, obj)
+
+def _dump_result(result):
+    doc = dict(result)
+    doc['_deferred'] = []
+    for keys, resolver, args in result.get_deferred():
+        # Only the plugins methods resolvers can be restored
+        if getattr(resolver, 'im_self', None) is None:
+            return None
+        doc['_deferred'].append([keys, resolver.__name__, list(args)])
+    return doc
+
+def _load_result(doc):
+    result = Result()
+    for keys, name, args in doc.pop('_deferred', None) or []:
+        result.defer(keys, _resolve_plugin, doc['plugin'], name, *args)
+    result.update([(k, v) for k, v in doc.items() if v is not None])
+    return result
+
+def _get_cached_results(key, ttl):
+    try:
+        docs = SearchCache.get_results(key, ttl)
+    except Exception, e:
+        logger.error('failed to get cached results: %s', str(e))
+        return None
+    if docs is not None:
+        return [_load_result(d) for d in docs]
+
+def _set_cached_results(key, docs):
+    if None in docs:
+        return
+    try:
+        SearchCache.set_results(key, docs)
+    except Exception, e:
+        logger.error('failed to cache results: %s', str(e))
+
+def _get_plugin_results(plugin, query, use_cache=True, **kwargs):
+    query_ = get_query(query, kwargs.get('category'))
+    if query and not query_:
+        logger.error('failed to process query "%s"', query)
+        return
+
+    # The cached results do not count in the plugin rate limit
+    ttl = _get_results_ttl(plugin) if use_cache else 0
+    if ttl:
+        key = _get_cache_key(plugin, query_, kwargs)
+        results = _get_cached_results(key, ttl)
+        if results is not None:
+            for result in results:
+                yield result
+            return
+
+    obj = registry.acquire(plugin)
+    if not obj:
+        return
+
+    discard = False
+    docs = []
+    try:
+        for result in obj.results(query_, **kwargs):
+            result.plugin = plugin
+            if ttl:
+                # Before the consumers update the result (e.g.: dedupe())
+                docs.append(_dump_result(result))
+            yield result
+        if ttl:
+            _set_cached_results(key, docs)
+    except SearchError, e:
+        discard = True
+        if getattr(obj.browser.url_error, 'code', None) == 429:
+            update_rate(plugin, count=-1)
+        logger.error('failed to get %s results for "%s": %s', plugin, query, str(e))
+        yield None
+    except RateLimitReached:
+        yield None
+    except Exception:
+        discard = True
+        raise
+    finally:
+        obj.browser.stop_prefetch()     # e.g.: the results are not consumed anymore
+        registry.release(plugin, obj, discard=discard)
+
+def _is_date_sorted(plugin):
+    module_ = _get_module(plugin)
+    return getattr(module_, 'DATE_SORTED', False) if module_ else False
+
+def _get_mark_date(date):
+    return date.replace(microsecond=0) if date else None
+
+def _get_mark_section(search_id):
+    return '%s.%s' % (HWM_SECTION, search_id)
+
+def _get_mark(search_id, plugin):
+    try:
+        return Work.get_info(_get_mark_section(search_id), plugin, None)
+    except Exception, e:
+        logger.error('failed to get %s high-water mark of search %s: %s', plugin, search_id, str(e))
+
+def _set_mark(search_id, plugin, date, keys):
+    try:
+        Work.set_info(_get_mark_section(search_id), plugin,
+                {'date': date, 'keys': sorted(keys)})
+    except Exception, e:
+        logger.error('failed to set %s high-water mark of search %s: %s', plugin, search_id, str(e))
+
+def remove_marks(search_id):
+    '''Remove the high-water marks of a deleted search.
+    '''
+    Work.remove({'section': _get_mark_section(search_id)}, safe=True)
+
+def incremental_results(results, search_id, plugin, margin=HWM_MARGIN):
+    '''Get the date sorted results newer than the (search, plugin)
+    high-water mark: the newest date and the results seen at that date.
+
+    The search is stopped after margin consecutive older results,
+    and the mark is updated once the search is complete.
+    '''
+    mark = _get_mark(search_id, plugin) or {}
+    date = _get_mark_date(mark.get('date'))
+    keys = set(mark.get('keys', []))
+    newest, newest_keys = date, set(keys)
+    older = 0
+    complete = True
+
+    for result in results:
+        if result is None:
+            complete = False
+            yield None
             continue
 
-        query_ = get_query(query, kwargs.get('category'))
-        if query and not query_:
-            logger.error('failed to process query "%s"', query)
+        date_ = _get_mark_date(result.get('date'))
+        key = _get_result_key(result)
+        if date and date_ and (date_ < date or (date_ == date and key in keys)):
+            older += 1
+            if older >= margin:
+                break
             continue
 
-        try:
-            for result in obj.results(query_, **kwargs):
-                result.plugin = plugin
+        older = 0
+        if date_ and key:
+            if newest is None or date_ > newest:
+                newest, newest_keys = date_, set([key])
+            elif date_ == newest:
+                newest_keys.add(key)
+        yield result
+
+    if hasattr(results, 'close'):
+        results.close()     # stop the search
+    if complete and newest and (newest != date or newest_keys != keys):
+        _set_mark(search_id, plugin, newest, newest_keys)
+
+def _plugin_results(plugin, query, search_id=None, **kwargs):
+    res = _get_plugin_results(plugin, query, **kwargs)
+    if search_id and kwargs.get('sort') == 'date' and _is_date_sorted(plugin):
+        res = incremental_results(res, search_id, plugin)
+    for result in res:
+        yield result
+
+def _all_results(query, plugins, **kwargs):
+    for plugin in plugins:
+        for result in _plugin_results(plugin, query, **kwargs):
+            yield result
+
+def _concurrent_results(query, plugins, workers, plugin_timeout, **kwargs):
+    queue = Queue()
+    semaphore = BoundedSemaphore(workers)
+    stopped = {}
+    running = {}
+    started = object()
+    finished = object()
+
+    def stop(plugin):
+        '''Stop the plugin worker at its next deadline check,
+        e.g.: before its next request.
+        '''
+        stopped[plugin].set()
+        deadline_ = running.get(plugin)
+        if deadline_:
+            deadline_.cancel()
+
+    def worker(plugin):
+        with semaphore:
+            if stopped[plugin].is_set():
+                return
+            queue.put((plugin, started))
+            try:
+                with deadline(plugin_timeout) as deadline_:
+                    running[plugin] = deadline_
+                    if stopped[plugin].is_set():
+                        return
+                    for result in _plugin_results(plugin, query, **kwargs):
+                        if stopped[plugin].is_set():
+                            return
+                        queue.put((plugin, result))
+            except Exception, e:
+                if not stopped[plugin].is_set():
+                    logger.exception('failed to get %s results for "%s": %s', plugin, query, str(e))
+                    queue.put((plugin, None))
+            finally:
+                running.pop(plugin, None)
+                queue.put((plugin, finished))
+
+    for plugin in plugins:
+        stopped[plugin] = Event()
+        thread = Thread(target=worker, args=(plugin,))
+        thread.daemon = True
+        thread.start()
+
+    deadlines = {}
+    pending = set(plugins)
+    try:
+        while pending:
+            timeout = None
+            if deadlines:
+                timeout = max(0, min(deadlines.values()) - time.time())
+            try:
+                plugin, result = queue.get(timeout=timeout)
+            except Empty:
+                now = time.time()
+                for plugin, end in deadlines.items():
+                    if end <= now:
+                        logger.error('failed to get %s results for "%s": timeout', plugin, query)
+                        stop(plugin)
+                        pending.discard(plugin)
+                        del deadlines[plugin]
+                        yield None
+                continue
+
+            if plugin not in pending:
+                continue
+            if result is started:
+                deadlines[plugin] = time.time() + plugin_timeout
+            elif result is finished:
+                pending.discard(plugin)
+                deadlines.pop(plugin, None)
+            else:
                 yield result
-        except SearchError, e:
-            if plugin == 'torrentz' and obj.browser.url_error:
-                if obj.browser.url_error.reason.lower() == 'too many requests':
-                    update_rate(plugin, count=-1)
-            logger.error('failed to get %s results for "%s": %s', plugin, query, str(e))
+    finally:
+        for plugin in plugins:
+            stop(plugin)
+
+def _get_result_key(result):
+    if result.get('hash'):
+        return result.hash
+    if result.get('url'):
+        return normalize_url(result.url)
+
+def _merge_result(result, duplicate):
+    '''Merge the duplicate into the result.
+
+    :return: True if the result was updated
+    '''
+    updated = False
+    if duplicate.get('seeds') is not None and duplicate.seeds > (result.get('seeds') or 0):
+        result.seeds = duplicate.seeds
+        updated = True
+    if duplicate.get('date') and (not result.get('date') or duplicate.date < result.date):
+        result.date = duplicate.date
+        updated = True
+    for plugin in duplicate.plugins:
+        if plugin not in result.plugins:
+            result.plugins.append(plugin)
+            updated = True
+    return updated
+
+def dedupe(results, max_size=DEDUPE_SIZE, on_merge=None):
+    '''Drop the duplicate results, by hash or canonical url,
+    each release is yielded once.
+
+    The duplicates seeds, dates and plugins are merged in place
+    into the first result (max seeds, oldest date, plugins list).
+
+    :param max_size: maximum number of results remembered
+    :param on_merge: callable taking the result updated by a merge,
+        e.g.: to update what the consumers stored
+    '''
+    seen = OrderedDict()
+    for result in results:
+        if result is None:
             yield None
-        except RateLimitReached:
+            continue
+
+        if not result.get('plugins'):
+            result.plugins = [result.plugin] if result.get('plugin') else []
+        key = _get_result_key(result)
+        if key is None:
+            yield result
+            continue
+
+        result_ = seen.pop(key, None)
+        if result_ is not None:
+            seen[key] = result_
+            if _merge_result(result_, result) and on_merge:
+                on_merge(result_)
+            continue
+
+        seen[key] = result
+        if len(seen) > max_size:
+            seen.popitem(last=False)
+        yield result
+
+def _get_rank(result, size_min=None, size_max=None):
+    size_fit = 0
+    if result.get('size') is not None and size_min is not None \
+            and size_max is not None:
+        size_fit = -abs(result.size - (size_min + size_max) / 2.)
+    date = result.get('date')
+    return (result.get('seeds') or 0, size_fit,
+            date.timetuple() if date else ())
+
+def top_results(results, limit, min_seeds=None, good_enough=None,
+        size_min=None, size_max=None):
+    '''Get the best results ranked by seeds, size fit and date.
+    With min_seeds or good_enough, stop consuming the results
+    once the best results are all good enough.
+
+    :param limit: number of results
+    :param min_seeds: minimum seeds of a good enough result
+    :param good_enough: callable taking a result and returning True
+        if it is good enough
+
+    :return: the best results, after the None failure markers,
+        the results updated in place (see dedupe()) are ranked again
+        before being dropped
+    '''
+    def is_good(result):
+        if min_seeds is not None and (result.get('seeds') or 0) < min_seeds:
+            return False
+        if good_enough and not good_enough(result):
+            return False
+        return True
+
+    early_exit = min_seeds is not None or good_enough is not None
+    heap = []
+    for i, result in enumerate(results):
+        if result is None:
             yield None
+            continue
+
+        item = (_get_rank(result, size_min, size_max), -i, is_good(result), result)
+        if len(heap) < limit:
+            heapq.heappush(heap, item)
+        else:
+            while True:
+                r, i_, good, result_ = heap[0]
+                rank = _get_rank(result_, size_min, size_max)
+                if rank == r:
+                    break
+                heapq.heapreplace(heap, (rank, i_, is_good(result_), result_))
+            heapq.heappushpop(heap, item)
+        if early_exit and len(heap) == limit \
+                and all([good for r, i, good, res in heap]):
+            break
+
+    if hasattr(results, 'close'):
+        results.close()     # stop the remaining searches
+
+    res = [result for r, i, good, result in heap]
+    for result in sorted(res, key=lambda r: _get_rank(r, size_min, size_max), reverse=True):
+        yield result
+
+def results(query, plugins=None, concurrent=False, workers=WORKERS,
+        plugin_timeout=PLUGIN_TIMEOUT, dedupe_results=True, limit=None,
+        min_seeds=None, good_enough=None, use_cache=True, search_id=None,
+        on_merge=None, **kwargs):
+    '''Iterate over search results.
+
+    :param plugins: plugins names list (all plugins by default)
+    :param concurrent: query the plugins in parallel and
+        yield the results as they arrive
+    :param workers: maximum number of plugins queried simultaneously
+        in concurrent mode
+    :param plugin_timeout: maximum duration in seconds of
+        a plugin search in concurrent mode, the timed out or abandoned
+        searches are cancelled through their deadline
+    :param dedupe_results: merge the results of the same release
+        found by several plugins
+    :param limit: only yield the limit best results, with min_seeds or
+        good_enough the next pages and plugins are not searched once
+        the best results are good enough (see top_results())
+    :param min_seeds: minimum seeds of a good enough result
+    :param good_enough: callable taking a result and returning True
+        if it is good enough
+    :param use_cache: get the plugins results cached by the previous
+        searches, for RESULTS_TTL seconds (or the plugin RESULTS_TTL)
+    :param search_id: id of the periodic search, with sort='date'
+        only the results newer than the previous search are yielded
+        (see incremental_results())
+    :param on_merge: callable taking a result already yielded
+        and updated by the merge of a duplicate (see dedupe())
+    :param kwargs: plugins search parameters (e.g.: pages_max, prefetch:
+        number of pages fetched ahead) and filters (see Result.validate()),
+        compiled once as a ResultFilter
+
+    :return: Result objects or None when a plugin search failed
+    '''
+    if not plugins:
+        plugins = registry.get_plugins()
+    if not kwargs.get('filter'):
+        kwargs['filter'] = ResultFilter(**kwargs)
+
+    if concurrent:
+        res = _concurrent_results(query, plugins, workers,
+                plugin_timeout, use_cache=use_cache, search_id=search_id,
+                **kwargs)
+    else:
+        res = _all_results(query, plugins, use_cache=use_cache,
+                search_id=search_id, **kwargs)
+    if dedupe_results:
+        res = dedupe(res, on_merge=on_merge)
+    if limit:
+        res = top_results(res, limit, min_seeds=min_seeds,
+                good_enough=good_enough, size_min=kwargs.get('size_min'),
+                size_max=kwargs.get('size_max'))
+
+    for result in res:
+        yield result
@@ -47,30 +47,34 @@ class Binsearch(Base):
         logger.error('failed to get date from "%s"', age)
         return datetime.utcnow() - timedelta(days=1100)
 
-    def results(self, query, sort='date', pages_max=1, **kwargs):
+    def _next_url(self, page, browser=None):
+        tables = (browser or self.browser).cssselect('table')
+        if not tables:
+            return
+        links = tables[-1].cssselect('a')
+        if not links:
+            return
+        next_text = self.get_link_text(html.tostring(links[-1]))
+        if next_text == '&gt;':
+            return urljoin(self.url, links[-1].get('href'))
+
+    def results(self, query, sort='date', pages_max=1, prefetch=0, **kwargs):
         if not self.url:
             raise SearchError('no data')
 
-        url = None
-
         for i in range(pages_max):
             if i == 0:
-                if not self.browser.submit_form(url, fields={'q': query}):
+                if not self.browser.submit_form(self.url, fields={'q': query}):
                     raise SearchError('no data')
             else:
-                tables = self.browser.cssselect('table')
-                if not tables:
-                    continue
-                links = tables[-1].cssselect('a')
-                if not links:
+                url = self._next_url(i + 1)
+                if not url:
                     break
-                next_text = self.get_link_text(html.tostring(links[-1]))
-                if next_text != '&gt;':
-                    break
-                url = urljoin(self.url, links[-1].get('href'))
                 if not self.browser.open(url):
                     raise SearchError('no data')
 
+            self._prefetch_next(i + 1, pages_max, prefetch)
+
             for tr in self.browser.cssselect('table#r2 tr', []):
                 if tr.cssselect('th'):
                     continue
@@ -131,7 +135,7 @@ class Binsearch(Base):
 
 
 def _get_collection(url):
-    browser = Browser()
+    browser = Browser(site='binsearch')
     browser.open(url)
 
     res = []
@@ -7,11 +7,12 @@ from lxml import html
 
 from filetools.title import clean, is_url
 
-from mediacore.web import Base, Browser, throttle
-from mediacore.web.search import Result, SearchError
+from mediacore.web import Base, Browser, throttle, RE_OVERLOAD
+from mediacore.web.search import Result, SearchError, validate_many
 
 
 PRIORITY = 3
+DATE_SORTED = True  # results sorted by date with sort='date'
 CAT_DEF = {
     'anime': 'video',
     'apps': 'software',
@@ -25,7 +26,6 @@ RE_URL_SORT = {
     'date': re.compile(r'^\s*Age\s*$', re.I),
     'popularity': re.compile(r'^\s*Seeds\s*$', re.I),
     }
-RE_OVERLOAD = re.compile(r'please\s+try\s+again\s+in\s+a\s+few\s+seconds', re.I)
 RE_DETAILS = re.compile(r'&#8212;\s*([^&]+)&#187;\s*([^&]+)&#8212;\s*([^<]*)', re.I)
 RE_DATE = re.compile(r'^(\d+)\s+(\w+)', re.I)
 
@@ -36,6 +36,7 @@ class Bitsnoop(Base):
     URL = [
         'http://bitsnoop.com',
         ]
+    OVERLOAD_RE = RE_OVERLOAD
 
     def _get_date(self, val):
         res = RE_DATE.search(val.lower())
@@ -61,14 +62,14 @@ class Bitsnoop(Base):
         return datetime.now() - delta
 
     def _get_torrent_url(self, url):
-        browser = Browser()
+        browser = Browser(site=self.browser.site)
         if browser.open(url):
             links = browser.cssselect('a[title="Magnet Link"]')
             if links:
                 return links[0].get('href')
 
-    def _next(self, page):
-        return self.browser.follow_link(
+    def _next_url(self, page, browser=None):
+        return (browser or self.browser).find_link_url(
                 text_regex=re.compile(r'^\D*%s\D*$' % page),
                 url_regex=re.compile(r'/%s/' % page))
 
@@ -77,7 +78,7 @@ class Bitsnoop(Base):
 
     @throttle(300)
     def results(self, query, category=None, sort='date', pages_max=1,
-            **kwargs):
+            prefetch=0, **kwargs):
         if not self.url:
             raise SearchError('no data')
 
@@ -99,13 +100,16 @@ class Bitsnoop(Base):
                         raise SearchError('no data')
                     self._sort(sort)
 
+            self._prefetch_next(page, pages_max, prefetch)
             lis = self.browser.cssselect('#torrents li')
             if not lis:
                 if lis is None:
                     raise SearchError('no data')
-                elif RE_OVERLOAD.search(self.browser.tree.text_content()):
+                elif self.browser.overloaded:
                     raise SearchError('overload')
 
+            results = []
+            urls_info = {}
             for el in lis:
                 log = html.tostring(el, pretty_print=True)[:1000]
 
@@ -148,7 +152,12 @@ class Bitsnoop(Base):
                 if not result.get_size(tds[0].text):
                     continue
 
-                url_info = urljoin(self.url, links[0].get('href')).encode('utf-8')
+                urls_info[id(result)] = urljoin(self.url, links[0].get('href')).encode('utf-8')
+                results.append(result)
+
+            # Only fetch the details pages of the valid results
+            for result in validate_many(results, **kwargs):
+                url_info = urls_info[id(result)]
                 result.url = self._get_torrent_url(url_info)
                 if not result.url:
                     logger.error('failed to get magnet url from %s', url_info)
@@ -156,7 +165,4 @@ class Bitsnoop(Base):
                 if not result.get_hash():
                     continue
 
-                if not result.validate(**kwargs):
-                    continue
-
                 yield result
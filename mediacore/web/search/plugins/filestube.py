@@ -14,6 +14,7 @@ from mediacore.web.search import Result, SearchError
 
 
 PRIORITY = None
+DATE_SORTED = True  # results sorted by date with sort='date'
 API_URL = 'http://api.filestube.com'
 SORT_DEF = {
     'date': 'dd',
@@ -90,7 +91,7 @@ class Filestube(object):
 
 
 def _get_download_url(url):
-    browser = Browser()
+    browser = Browser(site='filestube')
     netloc_parts = urlparse(url).netloc.split('.')
 
     if 'mediafire' in netloc_parts:
@@ -7,12 +7,12 @@ from lxml import html
 
 from filetools.title import is_url
 
-from mediacore.web import Base, Browser, throttle
-from mediacore.web.search import Result, SearchError
+from mediacore.web import Base, Browser, throttle, RE_OVERLOAD
+from mediacore.web.search import Result, SearchError, validate_many
 
 
 PRIORITY = 5
-RE_OVERLOAD = re.compile(r'please\s+try\s+again\s+in\s+a\s+few\s+seconds', re.I)
+DATE_SORTED = True  # results sorted by date with sort='date'
 RE_DATE = re.compile(r'^(\d+)\s+(seconds?|minutes?|hours?|days?|months?|years?)$', re.I)
 
 logger = logging.getLogger(__name__)
@@ -22,6 +22,7 @@ class Isohunt(Base):
     URL = [
         'http://isohunt.to',
         ]
+    OVERLOAD_RE = RE_OVERLOAD
 
     def _get_date(self, val):
         d, t = RE_DATE.search(val).group(1, 2)
@@ -47,14 +48,14 @@ class Isohunt(Base):
         return now
 
     def _get_torrent_url(self, url):
-        browser = Browser()
+        browser = Browser(site=self.browser.site)
         if browser.open(url):
             links = browser.cssselect('a.btn-magnet')
             if links:
                 return links[0].get('href')
 
-    def _next(self, page):
-        return self.browser.follow_link(
+    def _next_url(self, page, browser=None):
+        return (browser or self.browser).find_link_url(
                 text_regex=re.compile(r'^\b%s\b$' % page),
                 url_regex=re.compile(r'page='))
 
@@ -71,7 +72,7 @@ class Isohunt(Base):
 
     @throttle(300)
     def results(self, query, category=None, sort='date', pages_max=1,
-            **kwargs):
+            prefetch=0, **kwargs):
         if not self.url:
             raise SearchError('no data')
 
@@ -90,13 +91,16 @@ class Isohunt(Base):
                         raise SearchError('no data')
                     self._sort(sort)
 
+            self._prefetch_next(page, pages_max, prefetch)
             trs = self.browser.cssselect('.table-torrents tr[data-key]')
             if not trs:
                 if trs is None:
                     raise SearchError('no data')
-                elif RE_OVERLOAD.search(self.browser.tree.text_content()):
+                elif self.browser.overloaded:
                     raise SearchError('overload')
 
+            results = []
+            urls_info = {}
             for tr in trs:
                 log = html.tostring(tr, pretty_print=True)[:1000]
 
@@ -149,9 +153,17 @@ class Isohunt(Base):
                     logger.error('failed to get date from "%s": %s', date, str(e))
                     continue
 
-                if not result.validate(**kwargs):
-                    continue
+                try:
+                    result.seeds = int(tr[-2].text)
+                except Exception:
+                    logger.error('failed to get seeds from %s', log)
+
+                urls_info[id(result)] = url_info
+                results.append(result)
 
+            # Only fetch the details pages of the valid results
+            for result in validate_many(results, **kwargs):
+                url_info = urls_info[id(result)]
                 result.url = self._get_torrent_url(url_info)
                 if not result.url:
                     logger.error('failed to get magnet url from %s', url_info)
@@ -159,9 +171,4 @@ class Isohunt(Base):
                 if not result.get_hash():
                     continue
 
-                try:
-                    result.seeds = int(tr[-2].text)
-                except Exception:
-                    logger.error('failed to get seeds from %s', log)
-
                 yield result
@@ -1,6 +1,5 @@
-import re
 from datetime import datetime
-from urlparse import urlparse, parse_qs
+from urlparse import urlparse, urljoin, parse_qs
 from urllib import urlencode
 from base64 import b64encode
 import logging
@@ -13,13 +12,12 @@ from filetools.title import clean
 
 from mediacore.model.settings import Settings
 
-from mediacore.web import Base, throttle
+from mediacore.web import Base, throttle, RE_OVERLOAD
 from mediacore.web.search import Result, LoginError, SearchError
 
 
 PRIORITY = 4
 QUERY_URL = 'http://rutracker.org/forum/tracker.php'
-RE_OVERLOAD = re.compile(r'please\s+try\s+again\s+in\s+a\s+few\s+seconds', re.I)
 
 logger = logging.getLogger(__name__)
 
@@ -31,10 +29,18 @@ class Rutracker(Base):
     URL = [
         'http://rutracker.org/forum/index.php',
         ]
+    OVERLOAD_RE = RE_OVERLOAD
 
     def __init__(self, username, password):
-        super(Rutracker, self).__init__()
-        self._login(username, password)
+        super(Rutracker, self).__init__(username=username)
+        if not self.url or not self.login(username, password):
+            raise LoginError('failed to login to rutracker')
+
+    def _is_logged(self):
+        for form in self.browser.forms():
+            if 'login_username' in [c.name for c in form.controls]:
+                return False
+        return True
 
     def _login(self, username, password):
         fields = {
@@ -42,18 +48,18 @@ class Rutracker(Base):
             'login_password': password,
             }
         if not self.browser.submit_form(self.url, index=2, fields=fields):
-            raise LoginError('failed to login to rutracker')
-        for form in self.browser.forms():
-            if set(fields.keys()) <= set([c.name for c in form.controls]):
-                raise LoginError('failed to login to rutracker')
+            return False
+        return self._is_logged()
 
-    def _next(self, page):
-        for link in self.browser.cssselect('.pg', []):
+    def _next_url(self, page, browser=None):
+        browser = browser or self.browser
+        for link in browser.cssselect('.pg', []):
             if link.text == str(page):
-                return self.browser.open(link.get('href'))
+                return urljoin(browser.geturl(), link.get('href'))
 
     @throttle(300)
-    def results(self, query, category=None, pages_max=1, **kwargs):
+    def results(self, query, category=None, pages_max=1, prefetch=0,
+            **kwargs):
         if not self.url:
             raise SearchError('no data')
 
@@ -66,12 +72,16 @@ class Rutracker(Base):
                 if not self.browser.open(url):
                     raise SearchError('no data')
 
+            self._prefetch_next(page, pages_max, prefetch)
             trs = self.browser.cssselect('#tor-tbl tbody tr')
             if not trs:
                 if trs is None:
                     raise SearchError('no data')
-                elif RE_OVERLOAD.search(self.browser.tree.text_content()):
+                elif self.browser.overloaded:
                     raise SearchError('overload')
+                elif not self._is_logged():
+                    self.session.expire()
+                    raise SearchError('session expired')
 
             for el in trs:
                 if len(el) == 1:
@@ -6,11 +6,13 @@ from lxml import html
 
 from filetools.title import clean, is_url
 
-from mediacore.web import Base, throttle
+from mediacore.web import Base, throttle, RE_OVERLOAD
+from mediacore.web.parser import Schema, Field
 from mediacore.web.search import Result, SearchError
 
 
 PRIORITY = 2
+DATE_SORTED = True  # results sorted by date with sort='date'
 CAT_DEF = {
     'anime': 'video',
     'apps': 'apps',
@@ -24,9 +26,17 @@ RE_URL_SORT = {
     'date': re.compile(r'^\s*Uploaded\s*$', re.I),
     'popularity': re.compile(r'^\s*SE\s*$', re.I),
     }
-RE_OVERLOAD = re.compile(r'please\s+try\s+again\s+in\s+a\s+few\s+seconds', re.I)
 RE_DETAILS = re.compile(r'uploaded\s+(.*?)\s*,\s*size\s+(.*?)\s*,', re.I)
 RE_DATE = re.compile(r'^(y-day|today|\d\d-\d\d|\d+)\s+(\d\d:\d\d|\d{4}|mins?\s+ago)$', re.I)
+ROWS = Schema('thepiratebay', '#searchResult tr:not([class="header"])', [
+    ('title', Field('div.detName a')),
+    ('url', Field('a[href^="magnet:?"]', '@href')),
+    ('details', Field('.detDesc', 'element',
+            convert=lambda el: clean(html.tostring(el)))),
+    ('category', Field('td:first-child a', convert=lambda v: v.lower(),
+            required=False)),
+    ('seeds', Field('td:nth-child(3)', convert=int, required=False)),
+    ])
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +46,8 @@ class Thepiratebay(Base):
         'http://thepiratebay.se',
         'http://pirateproxy.net',
         ]
+    TREE_ROOT = ('table', 'searchResult')
+    OVERLOAD_RE = RE_OVERLOAD
 
     def _get_date(self, val):
         d, t = RE_DATE.search(val).group(1, 2)
@@ -55,14 +67,8 @@ class Thepiratebay(Base):
             date = datetime.strptime('%s-%s %s' % (now.year, d, t), '%Y-%m-%d %H:%M') # add year to avoid exceptions like 29/02
         return date + (datetime.utcnow() - now)
 
-    def _get_torrent_url(self, tr):
-        for link in tr.cssselect('a'):
-            url = link.get('href')
-            if url.startswith('magnet:?'):
-                return url
-
-    def _next(self, page):
-        return self.browser.follow_link(
+    def _next_url(self, page, browser=None):
+        return (browser or self.browser).find_link_url(
                 text_regex=re.compile(r'^\D*%s\D*$' % page),
                 url_regex=re.compile(r'/%s/' % (page - 1)))
 
@@ -71,7 +77,7 @@ class Thepiratebay(Base):
 
     @throttle(300)
     def results(self, query, category=None, sort='date', pages_max=1,
-            **kwargs):
+            prefetch=0, **kwargs):
         if not self.url:
             raise SearchError('no data')
 
@@ -93,46 +99,34 @@ class Thepiratebay(Base):
                         raise SearchError('no data')
                     self._sort(sort)
 
-            trs = self.browser.cssselect('#searchResult tr:not([class="header"])')
-            if not trs:
-                if trs is None:
-                    raise SearchError('no data')
-                elif RE_OVERLOAD.search(self.browser.tree.text_content()):
-                    raise SearchError('overload')
+            self._prefetch_next(page, pages_max, prefetch)
+            if self.browser.tree is None:
+                raise SearchError('no data')
+            trs = ROWS.select(self.browser.tree)
+            if not trs and self.browser.overloaded:
+                raise SearchError('overload')
 
             for tr in trs:
                 if len(tr) < 4:
                     continue
 
-                log = html.tostring(tr, pretty_print=True)[:1000]
+                info = ROWS.extract(tr)
+                if not info:
+                    logger.error('failed to get result from %s',
+                            html.tostring(tr, pretty_print=True)[:1000])
+                    continue
 
                 result = Result()
                 result.type = 'torrent'
                 result.safe = False
-
-                try:
-                    result.category = tr[0].cssselect('a')[0].text.lower()
-                except Exception:
-                    logger.error('failed to get category from %s', log)
-
-                res = tr.cssselect('div.detName a')
-                if not res:
-                    logger.error('failed to get title from %s', log)
-                    continue
-                result.title = res[0].text
-
-                result.url = self._get_torrent_url(tr)
-                if not result.url:
-                    logger.error('failed to get magnet url from %s', log)
-                    continue
+                if info['category']:
+                    result.category = info['category']
+                result.title = info['title']
+                result.url = info['url']
                 if not result.get_hash():
                     continue
 
-                res = tr.cssselect('.detDesc')
-                if not res:
-                    logger.error('failed to get details from %s', log)
-                    continue
-                details = clean(html.tostring(res[0]))
+                details = info['details']
                 res_ = RE_DETAILS.search(details)
                 if not res_:
                     logger.error('failed to parse details: %s', details)
@@ -150,8 +144,6 @@ class Thepiratebay(Base):
                     logger.error('failed to get date from "%s": %s', date, str(e))
                     continue
 
-                try:
-                    result.seeds = int(tr[2].text)
-                except Exception:
-                    pass
+                if info['seeds'] is not None:
+                    result.seeds = info['seeds']
                 yield result
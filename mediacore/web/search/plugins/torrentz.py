@@ -1,18 +1,27 @@
 import re
+import time
 from datetime import datetime
-from urlparse import urljoin
+from urlparse import urljoin, urlsplit
+from Queue import Queue, Empty
+from threading import Thread, Event, Lock, BoundedSemaphore
 import logging
 
 from lxml import html
 
-from filetools.title import Title, clean, is_url
+from filetools.title import clean, is_url
 
-from mediacore.web import Base, Browser, throttle
-from mediacore.web.search import Result, SearchError
+from mediacore.web import Base, Browser, throttle, mirrors
+from mediacore.web.search import Result, SearchError, get_magnet_hash
 from mediacore.utils.utils import parse_magnet_url, RE_URL_MAGNET
+from mediacore.utils.deadline import deadline, remaining
+from mediacore.utils.title import get_search_re
 
 
 PRIORITY = 1
+DATE_SORTED = True  # results sorted by date with sort='date'
+RESULTS_TTL = 3600  # seconds, torrentz has the lowest rate limit
+MIRROR_WORKERS = 4
+MIRROR_TIMEOUT = 30     # seconds
 CAT_DEF = {
     'anime': re.compile(r'\banime\b', re.I),
     'apps': re.compile(r'\bapplications?\b', re.I),
@@ -30,6 +39,7 @@ RE_CATEGORIES = re.compile(r'&#187;\W*(.*)$')
 RE_SPONSORED_LINK = re.compile(r'sponsored\s+link', re.I)
 RE_APPROXIMATE_MATCH = re.compile(r'approximate\s+match', re.I)
 RE_ERROR = re.compile(r'copyright\s+complaint', re.I)
+RE_HASH = re.compile(r'^/?([0-9a-f]{40})$', re.I)
 
 logger = logging.getLogger(__name__)
 
@@ -43,7 +53,7 @@ class Torrentz(Base):
     def _mirror_urls(self, url):
         '''Iterate over mirror urls.
         '''
-        browser = Browser()
+        browser = Browser(site=self.browser.site)
         browser.open(url)
         results = browser.cssselect('div.download dl')
         if not results:
@@ -64,26 +74,88 @@ class Torrentz(Base):
                 if not mirror_url.startswith('/'):
                     yield mirror_url
 
-    def _torrent_urls(self, url):
-        '''Iterate over torrent urls fetched from the raw html data.
+    def _get_torrent_urls(self, url):
+        '''Get the torrent urls of a mirror page
+        or None if the page is not accessible.
         '''
-        browser = Browser()
+        browser = Browser(site=self.browser.site)
         if browser.open(url):
-            for link in browser.links(url_regex=RE_URL_MAGNET):
-                yield link.absolute_url
+            return [l.absolute_url for l in browser.links(url_regex=RE_URL_MAGNET)]
 
-    def _get_torrent_url(self, query, url):
-        re_q = Title(query).get_search_re(mode='__lazy__')
+    def _get_matching_url(self, re_q, torrent_urls):
+        for torrent_url in torrent_urls:
+            res = parse_magnet_url(torrent_url)
+            if not res or not 'dn' in res:
+                continue
 
-        for mirror_url in self._mirror_urls(url):
-            for torrent_url in self._torrent_urls(mirror_url):
-                res = parse_magnet_url(torrent_url)
-                if not res or not 'dn' in res:
-                    continue
+            title = clean(res['dn'][0])
+            if re_q.match(title):
+                return torrent_url
+
+    def _get_torrent_url(self, query, url):
+        '''Fetch the mirrors pages concurrently, the known fastest
+        mirrors first, and get the first torrent url matching the query.
+        The pending fetches are cancelled once it is found.
+        '''
+        re_q = get_search_re(query, mode='__lazy__')
+        mirror_urls = mirrors.sort_urls(list(self._mirror_urls(url)))
+        if not mirror_urls:
+            return
 
-                title = clean(res['dn'][0])
-                if re_q.match(title):
-                    return torrent_url
+        queue = Queue()
+        semaphore = BoundedSemaphore(MIRROR_WORKERS)
+        found = Event()
+        deadlines = []
+        lock = Lock()
+        timeout = min(MIRROR_TIMEOUT, remaining(MIRROR_TIMEOUT))
+
+        def worker(mirror_url):
+            res = None
+            try:
+                with semaphore:
+                    if found.is_set():
+                        return
+                    begin = time.time()
+                    with deadline(timeout) as deadline_:
+                        with lock:
+                            deadlines.append(deadline_)
+                        torrent_urls = self._get_torrent_urls(mirror_url)
+                    if found.is_set():  # cancelled
+                        return
+                    mirrors.record(mirror_url, alive=torrent_urls is not None,
+                            latency=time.time() - begin)
+                    res = self._get_matching_url(re_q, torrent_urls or [])
+            except Exception, e:
+                logger.exception('failed to get torrent url from %s: %s', mirror_url, str(e))
+            finally:
+                queue.put(res)
+
+        for mirror_url in mirror_urls:
+            thread = Thread(target=worker, args=(mirror_url,))
+            thread.daemon = True
+            thread.start()
+
+        try:
+            for i in range(len(mirror_urls)):
+                try:
+                    res = queue.get(timeout=remaining())
+                except Empty:
+                    logger.error('failed to get torrent url from %s: timeout', url)
+                    return
+                if res:
+                    return res
+        finally:
+            found.set()
+            with lock:
+                for deadline_ in deadlines:
+                    deadline_.cancel()
+
+    def _resolve_url(self, query, url):
+        '''Get the deferred result values from the torrentz page.
+        '''
+        torrent_url = self._get_torrent_url(query, url)
+        if torrent_url:
+            return {'url': torrent_url, 'hash': get_magnet_hash(torrent_url)}
 
     def _get_date(self, val):
         return datetime.strptime(val, '%a, %d %b %Y %H:%M:%S')
@@ -94,8 +166,8 @@ class Torrentz(Base):
                 return key
         return 'other'
 
-    def _next(self, page):
-        return self.browser.follow_link(
+    def _next_url(self, page, browser=None):
+        return (browser or self.browser).find_link_url(
                 text_regex=re.compile(r'^%s$' % page),
                 url_regex=re.compile(r'\bp=%s\b' % (page - 1), re.I))
 
@@ -104,7 +176,7 @@ class Torrentz(Base):
 
     @throttle(10, 60)
     def results(self, query, category=None, sort='date', pages_max=1,
-            **kwargs):
+            prefetch=0, **kwargs):
         if not self.url:
             raise SearchError('no data')
 
@@ -123,6 +195,7 @@ class Torrentz(Base):
                     if sort != 'popularity':     # default sort is peers ('popularity')
                         self._sort(sort)
 
+            self._prefetch_next(page, pages_max, prefetch)
             divs = self.browser.cssselect('div.results')
             if divs is None:
                 raise SearchError('no data')
@@ -189,11 +262,13 @@ class Torrentz(Base):
                     except Exception:
                         logger.debug('failed to get seeds from %s', log)
 
-                    # Find torrent url
+                    # The torrent url is resolved from the mirrors pages
+                    # when accessed (see Result.defer() and search.resolve())
                     url_info = urljoin(self.url, links[0].get('href'))
-                    result.url = self._get_torrent_url(query, url_info)
-                    if not result.url:
-                        continue
-                    if not result.get_hash():
-                        continue
+                    res = RE_HASH.search(urlsplit(url_info).path)
+                    if res:
+                        result.hash = res.group(1).lower()
+                        result.defer(('url',), self._resolve_url, query, url_info)
+                    else:
+                        result.defer(('url', 'hash'), self._resolve_url, query, url_info)
                     yield result
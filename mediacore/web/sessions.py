@@ -0,0 +1,103 @@
+import os
+import time
+import hashlib
+import cookielib
+import tempfile
+from threading import Lock, RLock
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class Session(object):
+    '''Authenticated session of a site user, shared by the site instances.
+    '''
+    def __init__(self, file=None):
+        self.file = file
+        self.cookie_jar = cookielib.LWPCookieJar()
+        self.lock = RLock()
+        self.validated = None
+        if file and os.path.exists(file):
+            try:
+                self.cookie_jar.load(file, ignore_discard=True, ignore_expires=False)
+            except Exception, e:
+                logger.error('failed to load session file %s: %s', file, str(e))
+
+    def is_valid(self, ttl):
+        '''Check if the session was validated less than ttl seconds ago.
+        '''
+        return self.validated is not None and time.time() - self.validated < ttl
+
+    def has_cookies(self):
+        return len(self.cookie_jar) > 0
+
+    def validate(self):
+        self.validated = time.time()
+        self.save()
+
+    def expire(self):
+        '''Mark the session as expired, the next login will be checked.
+        '''
+        self.validated = None
+
+    def clear(self):
+        self.validated = None
+        self.cookie_jar.clear()
+        if self.file and os.path.exists(self.file):
+            os.remove(self.file)
+
+    def save(self):
+        if not self.file:
+            return
+        dir = os.path.dirname(self.file)
+        try:
+            if not os.path.exists(dir):
+                os.makedirs(dir)
+            fd, temp_file = tempfile.mkstemp(dir=dir)
+            os.close(fd)
+            # Keep the session cookies which are usually discarded
+            self.cookie_jar.save(temp_file, ignore_discard=True, ignore_expires=False)
+            os.rename(temp_file, self.file)
+        except Exception, e:
+            logger.error('failed to save session file %s: %s', self.file, str(e))
+
+
+class SessionStore(object):
+    '''Sessions keyed by site and username,
+    saved as cookie files when a path is set.
+    '''
+    def __init__(self, path=None):
+        self.path = path
+        self._sessions = {}
+        self._lock = Lock()
+
+    def _get_file(self, site, username):
+        if self.path:
+            name = hashlib.sha1('%s\n%s' % (site, username)).hexdigest()
+            return os.path.join(self.path, '%s-%s.lwp' % (site, name[:16]))
+
+    def get(self, site, username):
+        key = (site, username)
+        with self._lock:
+            if key not in self._sessions:
+                self._sessions[key] = Session(self._get_file(site, username))
+            return self._sessions[key]
+
+    def clear(self):
+        with self._lock:
+            self._sessions = {}
+
+
+store = SessionStore()
+
+
+def configure(path):
+    '''Save the sessions cookies in the path directory
+    so they are shared across processes.
+    '''
+    global store
+    store = SessionStore(path)
+
+def get_session(site, username):
+    return store.get(site, username)
@@ -5,11 +5,10 @@ import logging
 
 from lxml import html
 
-from filetools.title import Title, clean
+from filetools.title import clean
 
-from systools.system import timeout
-
-from mediacore.web import Base
+from mediacore.web import Base, timeout
+from mediacore.utils.title import get_search_re
 
 
 RE_URL_BAND = re.compile(r'/bands/', re.I)
@@ -24,13 +23,14 @@ logger = logging.getLogger(__name__)
 
 class Sputnikmusic(Base):
     URL = 'http://www.sputnikmusic.com/'
+    CACHE_TTL = 86400
 
     def _get_band_url(self, artist):
         if not self.browser.submit_form(self.url,
                 fields={'search_text': artist}):
             return
         if RE_SUGGESTIONS.search(self.browser.tree.text_content()):
-            re_name = Title(artist).get_search_re()
+            re_name = get_search_re(artist)
             if not self.browser.follow_link(text_regex=re_name):
                 return
         url = self.browser.geturl()
@@ -118,7 +118,7 @@ class Sputnikmusic(Base):
         if not album:
             return info
         if info:
-            re_album = Title(album).get_search_re()
+            re_album = get_search_re(album)
             for res in info['albums']:
                 if re_album.search(res['title']):
                     return res
@@ -141,6 +141,8 @@ class Sputnikmusic(Base):
         return res
 
     def _get_reviews_url(self):
+        if not self.browser.open(self.url):
+            return
         for link in self.browser.cssselect('li a', []):
             if link.text and RE_REVIEWS.search(link.text):
                 return urljoin(self.url, link.get('href'))
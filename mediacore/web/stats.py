@@ -0,0 +1,138 @@
+import time
+import json
+from collections import deque
+from urlparse import urlsplit
+from threading import local, Lock
+from contextlib import contextmanager
+import logging
+
+
+TIMINGS = ('connect', 'ttfb', 'download', 'decompress', 'parse', 'total')
+PERCENTILES = (50, 95, 99)
+MAX_SAMPLES = 1000  # samples kept per site and timing
+
+logger = logging.getLogger(__name__)
+
+_local = local()
+
+
+def _get_percentile(values, percent):
+    index = int(round(percent / 100. * (len(values) - 1)))
+    return values[index]
+
+
+class SiteStats(object):
+
+    def __init__(self, max_samples=MAX_SAMPLES):
+        self.count = 0
+        self.errors = 0
+        self.bytes = 0
+        self.hosts = {}
+        self.samples = dict([(name, deque(maxlen=max_samples)) for name in TIMINGS])
+
+    def add(self, info):
+        self.count += 1
+        if info['error']:
+            self.errors += 1
+        self.bytes += info['bytes']
+        self.hosts[info['host']] = self.hosts.get(info['host'], 0) + 1
+        for name, duration in info['timings'].items():
+            self.samples[name].append(duration)
+
+    def get(self):
+        res = {
+            'count': self.count,
+            'errors': self.errors,
+            'bytes': self.bytes,
+            'hosts': dict(self.hosts),
+            }
+        for name, samples in self.samples.items():
+            if not samples:
+                continue
+            values = sorted(samples)
+            info = {'mean': sum(values) / len(values)}
+            for percent in PERCENTILES:
+                info['p%s' % percent] = _get_percentile(values, percent)
+            res[name] = info
+        return res
+
+
+class Registry(object):
+    '''Per-site aggregates of the Browser requests timings.
+    '''
+    def __init__(self, max_samples=MAX_SAMPLES):
+        self.max_samples = max_samples
+        self._sites = {}
+        self._lock = Lock()
+
+    def record(self, info):
+        with self._lock:
+            site = info['site'] or info['host']
+            if site not in self._sites:
+                self._sites[site] = SiteStats(self.max_samples)
+            self._sites[site].add(info)
+
+    def get(self, site=None):
+        with self._lock:
+            if site:
+                stats = self._sites.get(site)
+                return stats.get() if stats else {}
+            return dict([(k, v.get()) for k, v in self._sites.items()])
+
+    def clear(self):
+        with self._lock:
+            self._sites = {}
+
+
+registry = Registry()
+
+
+@contextmanager
+def request(site, url):
+    '''Collect the timings of a request made in the block.
+    '''
+    info = {
+        'site': site,
+        'host': urlsplit(url).netloc,
+        'bytes': 0,
+        'error': True,
+        'timings': {},
+        }
+    parent = getattr(_local, 'current', None)
+    _local.current = info
+    begin = time.time()
+    try:
+        yield info
+        info['error'] = False
+    finally:
+        info['timings']['total'] = time.time() - begin
+        _local.current = parent
+        registry.record(info)
+
+def add_timing(name, duration):
+    '''Add a duration to the current request timing.
+    '''
+    info = getattr(_local, 'current', None)
+    if info is not None:
+        info['timings'][name] = info['timings'].get(name, 0) + duration
+
+def add_bytes(count):
+    info = getattr(_local, 'current', None)
+    if info is not None:
+        info['bytes'] += count
+
+def get_stats(site=None):
+    '''Get the requests stats per site.
+
+    :param site: site module name (e.g.: 'torrentz')
+    '''
+    return registry.get(site)
+
+def dump(file=None):
+    '''Get the requests stats as JSON, optionally saved to a file.
+    '''
+    data = json.dumps(get_stats(), indent=4, sort_keys=True)
+    if file:
+        with open(file, 'w') as fd:
+            fd.write(data)
+    return data
@@ -4,11 +4,12 @@ from urlparse import urljoin, parse_qs
 import requests
 import logging
 
-from filetools.title import Title, clean
+from filetools.title import clean
 from filetools.media import files, clean_file, move_file, mkdtemp
 from filetools.download import unpack_download
 
 from mediacore.web import Base, RealBrowser
+from mediacore.utils.title import get_search_re
 
 
 DEFAULT_LANG = 'english'
@@ -75,10 +76,10 @@ class Subscene(Base):
             return
 
         if season and episode:
-            re_name = Title(name).get_search_re(mode='__all__')
+            re_name = get_search_re(name, mode='__all__')
             re_sub = re.compile(r'[^1-9]%s\D*%s\D' % (season, str(episode).zfill(2)))
         else:
-            re_name = Title(name).get_search_re()
+            re_name = get_search_re(name)
             re_sub = None
 
         re_lang = re.compile(r'\b%s\b' % lang, re.I)
@@ -5,11 +5,10 @@ import logging
 
 from lxml import html
 
-from filetools.title import Title, clean, is_url
+from filetools.title import clean, is_url
 
-from systools.system import timeout
-
-from mediacore.web import Base
+from mediacore.web import Base, timeout
+from mediacore.utils.title import get_search_re
 
 
 URL_SCHEDULE = 'http://www.tvrage.com/schedule.php'
@@ -31,13 +30,14 @@ def get_year(val):
 
 class Tvrage(Base):
     URL = 'http://www.tvrage.com'
+    CACHE_TTL = 43200
 
     def _process(self, query):
         if is_url(query):
             return self.browser.open(query)
 
         if self.browser.submit_form(self.url, index=0, fields={'search': query}):
-            re_q = Title(query).get_search_re()
+            re_q = get_search_re(query)
             for res in self.browser.cssselect('#show_search a', []):
                 url = res.get('href')
                 if not url or not res.text:
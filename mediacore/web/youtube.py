@@ -1,19 +1,39 @@
 import logging
 
+import atom.http
 import gdata.youtube.service
 
-from filetools.title import Title, clean
+from filetools.title import clean
 
-from systools.system import timeout
+from systools.system import TimeoutError
+
+from mediacore.web import timeout, REQUEST_TIMEOUT
+from mediacore.utils.deadline import get_timeout
+from mediacore.utils.title import get_search_re
 
 
 logger = logging.getLogger(__name__)
 
 
+class HttpClient(atom.http.ProxiedHttpClient):
+    '''Gdata HTTP client with the sockets timeouts
+    limited by the current deadline.
+    '''
+    def _prepare_connection(self, url, headers):
+        timeout_ = get_timeout(REQUEST_TIMEOUT)
+        connection = atom.http.ProxiedHttpClient._prepare_connection(self,
+                url, headers)
+        connection.timeout = timeout_
+        if connection.sock:
+            connection.sock.settimeout(timeout_)
+        return connection
+
+
 class Youtube(object):
 
     def __init__(self, ssl=True):
-        self.yt_service = gdata.youtube.service.YouTubeService()
+        self.yt_service = gdata.youtube.service.YouTubeService(
+                http_client=HttpClient())
         self.yt_service.ssl = ssl
 
     def results(self, query):
@@ -23,6 +43,8 @@ class Youtube(object):
         yt_query.racy = 'include'
         try:
             feed = self.yt_service.YouTubeQuery(yt_query)
+        except TimeoutError:
+            raise
         except Exception, e:
             logger.error('failed to process query "%s": %s', query, str(e))
             return
@@ -43,7 +65,7 @@ class Youtube(object):
     @timeout(120)
     def get_trailer(self, title, date=None):
         title = clean(title)
-        re_title = Title(title).get_search_re(mode='__all__')
+        re_title = get_search_re(title, mode='__all__')
 
         queries = ['%s trailer' % title, title]
         if date:
@@ -61,7 +83,7 @@ class Youtube(object):
         artist = clean(artist)
         album = clean(album)
 
-        re_title = Title(artist).get_search_re(mode='__all__')
+        re_title = get_search_re(artist, mode='__all__')
         for result in self.results('%s %s' % (artist, album)):
             if not result['title'] or not result['url_watch'] or not result['urls_thumbnails']:
                 continue
@@ -1,22 +1,42 @@
 #!/usr/bin/env python
 import os
+import copy
 import re
 import shutil
 import tempfile
-from datetime import timedelta
+from datetime import datetime, timedelta
 import unittest
 from contextlib import contextmanager, nested
+from cStringIO import StringIO
+from threading import Event
+import mimetools
+import cookielib
+import zlib
+import socket
+import errno
+import httplib
+from urllib2 import URLError, HTTPError
 import json
+import time
 import logging
 
 from mock import patch, Mock
+from bson.objectid import ObjectId
+import atom.url
+import mechanize
+from mechanize._response import closeable_response
 
 from mediacore.utils.utils import parse_magnet_url
 from mediacore.utils.filter import validate_info
 from mediacore.utils.filter import logger as filter_logger
+from mediacore.utils.tasks import run_tasks
+from mediacore.utils.title import LruCache
+from mediacore.utils import title as module_title
+from mediacore.utils.deadline import (deadline, timeout, check, remaining,
+        TimeoutError)
 
 from mediacore.web.google import Google
-from mediacore.web.youtube import Youtube
+from mediacore.web.youtube import Youtube, HttpClient as YoutubeHttpClient
 from mediacore.web.imdb import Imdb
 from mediacore.web.tvrage import Tvrage
 from mediacore.web.sputnikmusic import Sputnikmusic
@@ -27,12 +47,30 @@ from mediacore.web.subscene import Subscene
 from mediacore.web.netflix import Netflix
 
 from mediacore import web as module_web
-from mediacore.web.search import Result, RateLimitReached
+from mediacore.web import search as module_search
+from mediacore.web import pool as module_pool
+from mediacore.web.pool import ConnectionPool
+from mediacore.web.mirrors import MirrorCache
+from mediacore.web import mirrors as module_mirrors
+from mediacore.web import cache as module_cache
+from mediacore.web.cache import ResponseCache, CacheHandler, normalize_url
+from mediacore.web.parser import (get_tree, get_selector, SelectorMixin,
+        Schema, Field, get_stats as get_parser_stats)
+from mediacore.web.compression import read as read_response
+from mediacore.web.sessions import SessionStore
+from mediacore.web import stats
+from mediacore.web.ratelimit import RateLimiter
+from mediacore.model.work import Work
+from mediacore.model.result import Result as ResultModel
+from mediacore.model.search import Search
+from mediacore.web.controller import Controller
+from mediacore.web.search import Result, ResultFilter, RateLimitReached, PluginRegistry
 from mediacore.web.search.plugins.thepiratebay import Thepiratebay
 from mediacore.web.search.plugins.torrentz import Torrentz
 from mediacore.web.search.plugins.filestube import Filestube
 from mediacore.web.search.plugins.bitsnoop import Bitsnoop
 from mediacore.web.search.plugins.rutracker import Rutracker
+from mediacore.web.search.plugins.binsearch import Binsearch
 
 from mediacore.web.search import SearchError
 
@@ -271,41 +309,1222 @@ class ResultTest(unittest.TestCase):
     # Include
     def test_not_validate_result_include_regex(self):
         regex = re.compile('\\bother\\b', re.I)
-        self.assertFalse(self.result._validate_title(include=regex))
+        self.assertFalse(ResultFilter(include=regex).validate(self.result))
 
     def test_not_validate_result_include_string(self):
         regex = '\\bother\\b'
-        self.assertFalse(self.result._validate_title(include=regex))
+        self.assertFalse(ResultFilter(include=regex).validate(self.result))
 
     def test_validate_result_include_regex(self):
         regex = re.compile('\\btest\\b', re.I)
-        self.assertTrue(self.result._validate_title(include=regex))
+        self.assertTrue(ResultFilter(include=regex).validate(self.result))
 
     def test_validate_result_include_string(self):
         regex = '\\btest\\b'
-        self.assertTrue(self.result._validate_title(include=regex))
+        self.assertTrue(ResultFilter(include=regex).validate(self.result))
 
     # Exclude
     def test_not_validate_result_exclude_regex(self):
         regex = re.compile('\\btest\\b', re.I)
-        self.assertFalse(self.result._validate_title(exclude=regex))
+        self.assertFalse(ResultFilter(exclude=regex).validate(self.result))
 
     def test_not_validate_result_exclude_string(self):
         regex = '\\btest\\b'
-        self.assertFalse(self.result._validate_title(exclude=regex))
+        self.assertFalse(ResultFilter(exclude=regex).validate(self.result))
 
     def test_validate_result_exclude_regex(self):
         regex = re.compile('\\bother\\b', re.I)
-        self.assertTrue(self.result._validate_title(exclude=regex))
+        self.assertTrue(ResultFilter(exclude=regex).validate(self.result))
 
     def test_validate_result_exclude_string(self):
         regex = '\\bother\\b'
-        self.assertTrue(self.result._validate_title(exclude=regex))
+        self.assertTrue(ResultFilter(exclude=regex).validate(self.result))
+
+    # Filter
+    def test_filter(self):
+        filter_ = ResultFilter(include_raw='\\btitle\\b', exclude=['\\bother\\b', None],
+                size_min=100, size_max=200, category='tv')
+        self.assertTrue(self.result.validate(filter=filter_))
+        self.result.size = 300
+        self.assertFalse(self.result.validate(filter=filter_))
+        self.assertTrue(self.result.validate(include='\\btest\\b'))
+        self.result.title = 'other title'
+        self.result.size = 150
+        self.assertFalse(self.result.validate(filter=filter_))
+
+    def test_validate_many(self):
+        results = []
+        for title, size in [('test a 720p', 100), ('test b', None),
+                ('test c 720p', 500), ('test d 720p', 150), ('test e 1080p', 100)]:
+            result = Result()
+            result.title = title
+            result.size = size
+            results.append(result)
+        res = module_search.validate_many(results, include_raw=['\\btest\\b', '\\b720p\\b'],
+                exclude=['\\bb\\b', '\\bd\\b'], size_max=200)
+        self.assertEqual([r.title for r in res], ['test a 720p'])
+
+        filter_ = ResultFilter(include=['^test', '\\b720p\\b'], exclude=['\\b(c)\\b', '(x)\\1'])
+        self.assertEqual(len(filter_.include), 1)
+        self.assertEqual(len(filter_.exclude), 2)
+        res = module_search.validate_many(results, filter=filter_)
+        self.assertEqual([r.title for r in res], ['test a 720p', 'test d 720p'])
+
+    def test_title_memoized(self):
+        title = self.result.get_title()
+        self.assertTrue(self.result.get_title() is title)
+        self.result.title = 'other title'
+        self.assertEqual(self.result.get_title().full_name, 'other title')
+
+
+class TasksTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def test_dependencies(self):
+        tasks = {
+            'a': (lambda: 1, []),
+            'b': (lambda a: a + 1, ['a']),
+            'c': (lambda a, b: a + b, ['a', 'b']),
+            }
+        self.assertEqual(run_tasks(tasks), {'a': 1, 'b': 2, 'c': 3})
+
+    def test_failure(self):
+        def fail():
+            raise Exception('error')
+
+        tasks = {
+            'a': (fail, []),
+            'b': (lambda a: a, ['a']),
+            }
+        self.assertEqual(run_tasks(tasks), {'a': None, 'b': None})
+
+    def test_timeout(self):
+        tasks = {
+            'a': (lambda: 1, []),
+            'b': (lambda: time.sleep(1), []),
+            'c': (lambda b: 1, ['b']),
+            }
+        begin = time.time()
+        self.assertEqual(run_tasks(tasks, timeout=.1), {'a': 1})
+        self.assertTrue(time.time() - begin < 1)
+
+    def test_unknown_dependency(self):
+        tasks = {'a': (lambda b: 1, ['b'])}
+        self.assertRaises(ValueError, run_tasks, tasks)
+
+
+class TitleCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        module_title.clear()
+
+    def test_cache(self):
+        title = module_title.get_title('Test Title')
+        self.assertTrue(module_title.get_title('Test Title') is title)
+        re_ = module_title.get_search_re('Test Title', mode='__all__')
+        self.assertTrue(module_title.get_search_re('Test Title', mode='__all__') is re_)
+        module_title.get_search_re('Test Title')
+        stats = module_title.get_stats()
+        self.assertEqual(stats['titles'], {'size': 1, 'hits': 3, 'misses': 1})
+        self.assertEqual(stats['patterns'], {'size': 2, 'hits': 1, 'misses': 2})
+
+    def test_size(self):
+        cache = LruCache(size=2)
+        for key in ('a', 'b', 'a', 'c', 'b'):
+            cache.get(key, lambda: key.upper())
+        self.assertEqual(cache.get_stats(), {'size': 2, 'hits': 1, 'misses': 4})
+        self.assertEqual(cache.get('c', lambda: None), 'C')
+
+
+class DeadlineTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def test_nested(self):
+        self.assertEqual(remaining(), None)
+        with deadline(1):
+            with deadline(10):
+                self.assertTrue(remaining() <= 1)
+            with deadline(.5):
+                self.assertTrue(remaining() <= .5)
+        self.assertEqual(remaining(), None)
+
+    def test_check(self):
+        with deadline(.01):
+            check()
+            time.sleep(.02)
+            self.assertRaises(TimeoutError, check)
+
+    def test_timeout(self):
+        @timeout(.01)
+        def func():
+            time.sleep(.02)
+            check()
+
+        self.assertRaises(TimeoutError, func)
+
+    def test_timeout_thread(self):
+        res = run_tasks({'a': (lambda: remaining(), [])}, timeout=1)
+        self.assertTrue(0 < res['a'] <= 1)
+
+    def test_cancel(self):
+        with deadline(10) as deadline_:
+            with deadline(5):
+                check()
+                deadline_.cancel()
+                self.assertEqual(remaining(), 0)
+                self.assertRaises(TimeoutError, check)
+        self.assertTrue(deadline_.exceeded)
 
 
 #
 # Web
 #
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.key = ('http', 'host')
+
+    def test_reuse(self):
+        pool = ConnectionPool()
+        conn, reused = pool.get(self.key, Mock)
+        self.assertFalse(reused)
+        pool.put(self.key, conn)
+
+        conn_, reused = pool.get(self.key, Mock)
+        self.assertTrue(reused)
+        self.assertTrue(conn_ is conn)
+        stats = pool.stats('http://host')
+        self.assertEqual(stats['connections'], 1)
+        self.assertEqual(stats['reused'], 1)
+
+    def test_idle_timeout(self):
+        pool = ConnectionPool(idle_timeout=-1)
+        conn, reused = pool.get(self.key, Mock)
+        pool.put(self.key, conn)
+
+        conn_, reused = pool.get(self.key, Mock)
+        self.assertFalse(reused)
+        self.assertTrue(conn.close.called)
+        self.assertEqual(pool.stats('http://host')['expired'], 1)
+
+    def test_size(self):
+        pool = ConnectionPool(size=1)
+        conn1, reused = pool.get(self.key, Mock)
+        conn2, reused = pool.get(self.key, Mock)
+        pool.put(self.key, conn1)
+        pool.put(self.key, conn2)
+
+        self.assertFalse(conn1.close.called)
+        self.assertTrue(conn2.close.called)
+        self.assertEqual(pool.stats('http://host')['idle'], 1)
+
+    def _open(self, error, data=None, on_send=False):
+        stale = Mock()
+        if on_send:
+            stale.request.side_effect = error
+        else:
+            stale.getresponse.side_effect = error
+        conn = Mock()
+        conn.getresponse.return_value.will_close = False
+        conn.getresponse.return_value.status = 200
+        conn.getresponse.return_value.msg = mimetools.Message(StringIO(''))
+        http_class = Mock(return_value=conn)
+
+        pool = ConnectionPool()
+        pool.put(self.key, stale)
+        with nested(patch.object(module_pool, 'pool', pool),
+                patch.object(module_pool, 'read', return_value=('data', True)),
+                ):
+            req = mechanize.Request('http://host/', data)
+            try:
+                res = module_pool.HTTPHandler()._keepalive_open(http_class, req)
+            except URLError:
+                res = None
+        self.assertTrue(stale.close.called)
+        self.assertEqual(stale.request.call_count, 1)
+        return res, http_class.called
+
+    def test_stale(self):
+        res, retried = self._open(httplib.BadStatusLine(''))
+        self.assertEqual(res.read(), 'data')
+        self.assertTrue(retried)
+        res, retried = self._open(socket.error(errno.EPIPE, 'broken pipe'),
+                data='q=1', on_send=True)
+        self.assertEqual(res.read(), 'data')
+
+    def test_not_retried(self):
+        for error, data in (
+                (socket.timeout('timed out'), None),
+                (httplib.BadStatusLine(''), 'q=1'),
+                (socket.error(errno.ECONNRESET, 'reset'), 'q=1'),
+                ):
+            res, retried = self._open(error, data)
+            self.assertEqual(res, None)
+            self.assertFalse(retried)
+
+
+class MirrorCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.mirrors = MirrorCache()
+        self.urls = ['http://mirror1', 'http://mirror2']
+
+    def test_select_cached(self):
+        probe = Mock(return_value=True)
+        self.assertEqual(self.mirrors.select(self.urls, probe), 'http://mirror1')
+        self.assertEqual(self.mirrors.select(self.urls, probe), 'http://mirror1')
+        self.assertEqual(len(probe.call_args_list), 1)
+
+    def test_select_fastest(self):
+        self.mirrors.record('http://mirror1', alive=True, latency=2)
+        self.mirrors.record('http://mirror2', alive=True, latency=1)
+        probe = Mock(return_value=True)
+        self.assertEqual(self.mirrors.select(self.urls, probe), 'http://mirror2')
+        self.assertFalse(probe.called)
+
+    def test_select_after_failure(self):
+        probe = Mock(side_effect=lambda url: url == 'http://mirror2')
+        self.assertEqual(self.mirrors.select(self.urls, probe), 'http://mirror2')
+
+        self.mirrors.report_failure('http://mirror2/path?q=1')
+        probe = Mock(return_value=False)
+        self.assertEqual(self.mirrors.select(self.urls, probe), None)
+        self.assertFalse(probe.called)
+
+    def test_sort(self):
+        urls = ['http://mirror1/a', 'http://mirror2/b', 'http://mirror3/c', 'http://mirror4/d']
+        self.mirrors.record('http://mirror1', alive=False)
+        self.mirrors.record('http://mirror3', alive=True, latency=2)
+        self.mirrors.record('http://mirror4', alive=True, latency=1)
+        self.assertEqual(self.mirrors.sort(urls), ['http://mirror4/d',
+                'http://mirror3/c', 'http://mirror2/b', 'http://mirror1/a'])
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def test_normalize_url(self):
+        self.assertEqual(normalize_url('HTTP://Host.com?b=2&a=1#anchor'),
+                'http://host.com/?a=1&b=2')
+
+    def test_get_key(self):
+        with mkdtemp() as temp_dir:
+            cache = ResponseCache(temp_dir)
+            self.assertEqual(cache.get_key('http://host/?a=1&b=2'),
+                    cache.get_key('http://host/?b=2&a=1'))
+            self.assertNotEqual(cache.get_key('http://host/', 'q=1'),
+                    cache.get_key('http://host/', 'q=2'))
+
+    def test_set_get(self):
+        with mkdtemp() as temp_dir:
+            cache = ResponseCache(temp_dir)
+            key = cache.get_key('http://host/')
+            self.assertEqual(cache.get(key), None)
+            cache.set(key, {'data': 'data'})
+            self.assertEqual(cache.get(key), {'data': 'data'})
+            cache.remove(key)
+            self.assertEqual(cache.get(key), None)
+
+
+class CacheHandlerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='tests_', dir=conf['temp_dir'])
+        module_cache.configure(self.temp_dir)
+        self.handler = CacheHandler(ttl=60)
+        self.url = 'http://host/page'
+        self.data = '<html><body>page</body></html>'
+
+    def tearDown(self):
+        module_cache.configure(None)
+        shutil.rmtree(self.temp_dir)
+
+    def _open(self, response=None):
+        req = self.handler.http_request(mechanize.Request(self.url))
+        res = self.handler.default_open(req)
+        if res is None and response:
+            res = self.handler.http_response(req, response)
+        return req, res
+
+    def _response(self, data='', code=200, headers=None):
+        headers = mimetools.Message(StringIO(''.join(['%s: %s\r\n' % h
+                for h in (headers or {}).items()])))
+        return closeable_response(StringIO(data), headers, self.url, code, 'msg')
+
+    def test_fresh(self):
+        req, res = self._open(self._response(self.data, headers={
+                'Content-Type': 'text/html; charset=utf-8',
+                'Set-Cookie': 'session=1',
+                }))
+        self.assertFalse(getattr(res, 'from_cache', False))
+        self.assertEqual(res.read(), self.data)
+
+        req, res = self._open()
+        self.assertTrue(res.from_cache)
+        self.assertEqual(res.read(), self.data)
+        self.assertEqual(res.info().getheader('content-type'), 'text/html; charset=utf-8')
+        self.assertEqual(res.info().getheader('set-cookie'), None)
+
+    def test_revalidate(self):
+        self._open(self._response(self.data, headers={
+                'Content-Type': 'text/html',
+                'ETag': '"v1"',
+                'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT',
+                }))
+        self.handler.ttl = 0
+
+        req, res = self._open()
+        self.assertEqual(res, None)
+        self.assertEqual(req.get_header('If-none-match'), '"v1"')
+        self.assertEqual(req.get_header('If-modified-since'), 'Mon, 01 Jan 2024 00:00:00 GMT')
+
+        stored = req.cache_entry['stored']
+        res = self.handler.http_response(req, self._response(code=304))
+        self.assertTrue(res.from_cache)
+        self.assertEqual(res.code, 200)
+        self.assertEqual(res.read(), self.data)
+        cache = module_cache.get_cache()
+        self.assertTrue(cache.get(req.cache_key)['stored'] >= stored)
+
+        req, res = self._open(self._response('<html>new</html>', headers={
+                'Content-Type': 'text/html',
+                }))
+        self.assertEqual(res.read(), '<html>new</html>')
+        self.assertEqual(cache.get(req.cache_key)['data'], '<html>new</html>')
+
+    def test_not_cached(self):
+        cache = module_cache.get_cache()
+        for response in (
+                self._response('torrent', headers={'Content-Type': 'application/x-bittorrent'}),
+                self._response(self.data, code=404, headers={'Content-Type': 'text/html'}),
+                ):
+            req, res = self._open(response)
+            self.assertTrue(res is response)
+            self.assertEqual(cache.get(req.cache_key), None)
+
+        req, res = self._open()
+        self.assertEqual(res, None)
+
+
+class ParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = '<html><head><script>var a = "<table>";</script></head><body><div id="header">header</div><table id="results"><tr><td>r\xc3\xa9sult</td></tr></table><p>footer</p></body></html>'
+
+    def test_get_tree(self):
+        tree = get_tree(self.data, encoding='utf-8')
+        self.assertFalse(tree.cssselect('script'))
+        self.assertEqual(tree.cssselect('#results td')[0].text, u'r\xe9sult')
+        self.assertEqual(tree.cssselect('p')[0].text, 'footer')
+
+    def test_get_subtree(self):
+        tree = get_tree(self.data, encoding='utf-8', root=('table', 'results'))
+        self.assertEqual(tree.tag, 'table')
+        self.assertEqual(tree.cssselect('#results td')[0].text, u'r\xe9sult')
+        self.assertFalse(tree.getroottree().getroot().cssselect('#header'))
+
+    def test_get_subtree_not_found(self):
+        tree = get_tree(self.data, encoding='utf-8', root=('table', 'missing'))
+        self.assertEqual(tree.tag, 'html')
+        self.assertTrue(tree.cssselect('#results'))
+
+    def test_selector_cache(self):
+        self.assertTrue(get_selector('#results td') is get_selector('#results td'))
+        data = self.data.replace('<p>', '<form><input name="q"></form><p>')
+        for root in (('table', 'results'), None):
+            tree = get_tree(data, encoding='utf-8', root=root)
+            self.assertTrue(isinstance(tree, SelectorMixin))
+            self.assertEqual(tree.cssselect('td')[0].text, u'r\xe9sult')
+        self.assertTrue(isinstance(tree.cssselect('input')[0], SelectorMixin))
+        self.assertEqual(tree.cssselect('form')[0].inputs.keys(), ['q'])
+
+    def test_schema(self):
+        data = '<table id="rows"><tr class="header"><th>name</th></tr>%s</table>' % ''.join([
+                '<tr><td><a href="/1">one</a></td><td>1</td></tr>',
+                '<tr><td><a href="/2">two</a></td><td>n/a</td></tr>',
+                '<tr><td>three</td><td>3</td></tr>',
+                ])
+        schema = Schema('test', '#rows tr:not([class="header"])', [
+                ('url', Field('a', '@href')),
+                ('name', Field('a', convert=lambda v: v.upper())),
+                ('count', Field('td:nth-child(2)', convert=int, required=False)),
+                ])
+        res = schema.extract_all(get_tree(data))
+        self.assertEqual(res, [
+                {'url': '/1', 'name': 'ONE', 'count': 1},
+                {'url': '/2', 'name': 'TWO', 'count': None},
+                ])
+
+        stats = schema.get_stats()
+        self.assertEqual(stats['url']['count'], 3)
+        self.assertEqual(stats['url']['errors'], 1)
+        self.assertEqual(stats['name']['count'], 2)
+        self.assertEqual(stats['count']['errors'], 1)
+        self.assertTrue(stats['count']['duration'] >= 0)
+        self.assertEqual(get_parser_stats()['test'], stats)
+
+
+class CompressionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = '<html><body>%s</body></html>' % ('<p>row</p>' * 1000)
+
+    def _read(self, data, content_type='text/html', encoding=None, **kwargs):
+        headers = 'Content-Type: %s\r\n' % content_type
+        if encoding:
+            headers += 'Content-Encoding: %s\r\n' % encoding
+        headers = mimetools.Message(StringIO(headers))
+        data, complete = read_response(StringIO(data), headers, **kwargs)
+        return data, complete, headers
+
+    def test_gzip(self):
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        data = compressor.compress(self.data) + compressor.flush()
+        res, complete, headers = self._read(data, encoding='gzip')
+        self.assertEqual(res, self.data)
+        self.assertTrue(complete)
+        self.assertEqual(headers.getheader('content-encoding'), None)
+        self.assertEqual(headers.getheader('content-length'), str(len(self.data)))
+
+    def test_deflate(self):
+        data = zlib.compress(self.data)
+        for data_ in (data, data[2:-4]):
+            res, complete, headers = self._read(data_, encoding='deflate')
+            self.assertEqual(res, self.data)
+
+    def test_max_size(self):
+        res, complete, headers = self._read(zlib.compress(self.data),
+                encoding='deflate', max_html_size=100)
+        self.assertEqual(res, self.data[:100])
+        self.assertFalse(complete)
+
+        res, complete, headers = self._read(self.data,
+                content_type='application/x-bittorrent', max_html_size=100)
+        self.assertEqual(res, self.data)
+        self.assertTrue(complete)
+
+
+class SessionTest(unittest.TestCase):
+
+    def _get_cookie(self, name):
+        return cookielib.Cookie(0, name, 'value', None, False, 'host.com',
+                False, False, '/', True, False, None, True, None, None, {})
+
+    def test_store(self):
+        with mkdtemp() as temp_dir:
+            store = SessionStore(temp_dir)
+            session = store.get('site', 'user')
+            self.assertTrue(store.get('site', 'user') is session)
+            self.assertFalse(store.get('site', 'user2') is session)
+            session.cookie_jar.set_cookie(self._get_cookie('session_id'))
+            session.validate()
+
+            session = SessionStore(temp_dir).get('site', 'user')
+            self.assertEqual([c.name for c in session.cookie_jar], ['session_id'])
+            self.assertFalse(session.is_valid(60))
+            session.clear()
+            self.assertFalse(SessionStore(temp_dir).get('site', 'user').has_cookies())
+
+    def _login(self, session, logged):
+        obj = Mock()
+        obj.session = session
+        obj.SESSION_TTL = 60
+        obj._is_logged.return_value = logged
+        obj._login.return_value = True
+        self.assertTrue(module_web.Base.login.im_func(obj, 'user', 'password'))
+        return obj
+
+    def test_login(self):
+        session = SessionStore().get('site', 'user')
+        obj = self._login(session, logged=False)
+        self.assertTrue(obj._login.called)
+        self.assertTrue(session.is_valid(60))
+
+        obj = self._login(session, logged=False)
+        self.assertFalse(obj._login.called)
+        self.assertFalse(obj.browser.open.called)
+
+        session.cookie_jar.set_cookie(self._get_cookie('session_id'))
+        session.expire()
+        obj = self._login(session, logged=True)
+        self.assertTrue(obj.browser.open.called)
+        self.assertFalse(obj._login.called)
+
+    def test_login_no_credentials(self):
+        obj = Mock()
+        obj.session = None
+        self.assertFalse(module_web.Base.login.im_func(obj, None, None))
+        obj.session = SessionStore().get('site', 'user')
+        self.assertFalse(module_web.Base.login.im_func(obj, 'user', ''))
+        self.assertFalse(obj._login.called)
+        self.assertFalse(obj.browser.open.called)
+
+
+class StatsTest(unittest.TestCase):
+
+    def setUp(self):
+        stats.registry.clear()
+
+    def test_request(self):
+        for i in range(1, 101):
+            with stats.request('site', 'http://host.com/path'):
+                stats.add_timing('ttfb', i)
+                stats.add_timing('parse', 1)
+                stats.add_timing('parse', 1)
+                stats.add_bytes(10)
+
+        res = stats.get_stats('site')
+        self.assertEqual(res['count'], 100)
+        self.assertEqual(res['errors'], 0)
+        self.assertEqual(res['bytes'], 1000)
+        self.assertEqual(res['hosts'], {'host.com': 100})
+        self.assertEqual(res['ttfb']['p50'], 51)
+        self.assertEqual(res['ttfb']['p95'], 95)
+        self.assertEqual(res['ttfb']['p99'], 99)
+        self.assertEqual(res['parse']['p50'], 2)
+        self.assertEqual(json.loads(stats.dump())['site']['count'], 100)
+
+    def test_error(self):
+        try:
+            with stats.request(None, 'http://host.com/path'):
+                raise ValueError()
+        except ValueError:
+            pass
+        stats.add_timing('ttfb', 1)     # outside a request
+        res = stats.get_stats('host.com')
+        self.assertEqual(res['errors'], 1)
+        self.assertFalse('ttfb' in res)
+
+    def test_site(self):
+        with patch.object(module_web.mirrors, 'get_url', return_value='http://host.com'):
+            for plugin in ('thepiratebay', 'torrentz'):
+                obj = module_search._get_plugin_object(plugin, {})
+                self.assertEqual(obj.browser.site, plugin)
+                self.assertEqual(obj.browser._clone().site, plugin)
+            self.assertEqual(Imdb().browser.site, 'imdb')
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.info = {}
+
+    def _inc_info(self, section, key, value=1):
+        name, bucket = key.split('.')
+        info = self.info.setdefault(name, {})
+        info[bucket] = info.get(bucket, 0) + value
+        return self.info
+
+    def _unset_info(self, section, keys):
+        for key in keys:
+            name, key = key.split('.')
+            self.info[name].pop(key, None)
+
+    def _set_info(self, section, key, value):
+        name, key = key.split('.')
+        self.info.setdefault(name, {})[key] = value
+
+    @contextmanager
+    def _patch_work(self):
+        with nested(patch.object(Work, 'inc_info', side_effect=self._inc_info),
+                patch.object(Work, 'unset_info', side_effect=self._unset_info),
+                patch.object(Work, 'set_info', side_effect=self._set_info),
+                ) as mocks:
+            yield mocks
+
+    def _get_limiters(self, count, limit, minutes):
+        limiters = [RateLimiter(lease_ratio=.2) for i in range(count)]
+        for limiter in limiters:
+            limiter.configure('site', limit, minutes)
+        return limiters
+
+    def test_shared_limit(self):
+        with self._patch_work() as (mock_inc, mock_unset, mock_set):
+            limiters = self._get_limiters(3, 10, 60)
+            allowed = 0
+            for i in range(10):
+                for limiter in limiters:
+                    if limiter.allow('site'):
+                        limiter.consume('site')
+                        allowed += 1
+            self.assertEqual(allowed, 10)
+            self.assertTrue(sum(self.info['site'].values()) <= 10)
+            self.assertTrue(mock_inc.call_count < 30)
+
+    def test_lease_release(self):
+        with self._patch_work():
+            limiter, limiter2 = self._get_limiters(2, 10, 60)
+            self.assertTrue(limiter.allow('site'))
+            limiter.consume('site')
+            self.assertEqual(sum(self.info['site'].values()), 2)
+            limiter.release()
+            self.assertEqual(sum(self.info['site'].values()), 1)
+
+    def test_sliding_window(self):
+        with self._patch_work():
+            limiter, = self._get_limiters(1, 10, 60)
+            with patch('mediacore.web.ratelimit.time.time') as mock_time:
+                mock_time.return_value = 6000.
+                for i in range(10):
+                    self.assertTrue(limiter.allow('site'))
+                    limiter.consume('site')
+                self.assertFalse(limiter.allow('site'))
+
+                mock_time.return_value = 6000. + 3000
+                self.assertFalse(limiter.allow('site'))
+                mock_time.return_value = 6000. + 3600
+                self.assertTrue(limiter.allow('site'))
+                self.assertEqual(sum(self.info['site'].values()), 2)
+                self.assertFalse('10' in self.info['site'])
+
+    def test_block(self):
+        with self._patch_work():
+            limiter, limiter2 = self._get_limiters(2, 10, 60)
+            self.assertTrue(limiter.allow('site'))
+            limiter.block('site')
+            self.assertFalse(limiter.allow('site'))
+            self.assertFalse(limiter2.allow('site'))
+            self.assertTrue(self.info['site']['blocked_until'] > time.time())
+
+
+class ControllerTest(unittest.TestCase):
+
+    def test_aimd(self):
+        controller = Controller(initial_limit=4)
+        for i in range(4):
+            controller.acquire('host')
+        self.assertEqual(controller.get_info('host')['inflight'], 4)
+        with deadline(.1):
+            self.assertRaises(TimeoutError, controller.acquire, 'host')
+
+        controller.release('host', overloaded=True, retry_after=0)
+        self.assertEqual(controller.get_info('host')['limit'], 2)
+        for i in range(3):
+            controller.release('host')
+        self.assertEqual(controller.get_info('host')['limit'], 3)
+        for i in range(10):
+            controller.acquire('host')
+            controller.release('host')
+        self.assertTrue(controller.get_info('host')['limit'] > 3)
+
+    def test_backoff(self):
+        controller = Controller()
+        controller.acquire('host')
+        controller.release('host', overloaded=True, retry_after=.2)
+        begin = time.time()
+        controller.acquire('host')
+        self.assertTrue(time.time() - begin >= .15)
+        controller.release('host', overloaded=True)
+        self.assertTrue(1.9 <= controller.get_info('host')['backoff'] <= 6)   # second failure
+
+    def test_backoff_deadline(self):
+        controller = Controller()
+        controller.acquire('host')
+        controller.release('host', overloaded=True, retry_after=10)
+        begin = time.time()
+        with deadline(5):
+            self.assertRaises(TimeoutError, controller.acquire, 'host')
+        self.assertTrue(time.time() - begin < .5)
+        self.assertEqual(controller.get_info('host')['inflight'], 0)
+
+    def test_failed(self):
+        controller = Controller(initial_limit=4)
+        for i in range(4):
+            controller.acquire('host')
+            controller.release('host', failed=True)
+        self.assertEqual(controller.get_info('host')['limit'], 4)
+        self.assertEqual(controller.get_info('host')['inflight'], 0)
+
+    def _open(self, error):
+        browser = module_web.Browser()
+        with patch.object(module_web.mechanize.Browser, '_mech_open', side_effect=error), \
+                patch.object(module_web, 'controller') as controller:
+            self.assertRaises(type(error), browser._controlled_open, 'http://host/')
+        return controller.release.call_args
+
+    def test_failed_request(self):
+        args, kwargs = self._open(socket.timeout('timed out'))
+        self.assertTrue(kwargs['overloaded'])
+        args, kwargs = self._open(URLError(socket.timeout('timed out')))
+        self.assertTrue(kwargs['overloaded'])
+        args, kwargs = self._open(URLError(socket.error('connection refused')))
+        self.assertFalse(kwargs['overloaded'])
+        self.assertTrue(kwargs['failed'])
+        args, kwargs = self._open(HTTPError('http://host/', 404, 'not found', None, None))
+        self.assertFalse(kwargs['overloaded'])
+        self.assertFalse(kwargs['failed'])
+
+    def test_overload_marker(self):
+        response = Mock()
+        response.info.return_value = mimetools.Message(StringIO('Content-Type: text/html\r\n'))
+        response.get_data.return_value = '<html>Please try again in a few seconds</html>'
+        self.assertFalse(module_web.Browser()._is_overloaded(response))
+        browser = module_web.Browser(overload_re=module_web.RE_OVERLOAD)
+        self.assertTrue(browser._is_overloaded(response))
+        self.assertTrue(browser._clone()._is_overloaded(response))
+        self.assertEqual(Thepiratebay.OVERLOAD_RE, module_web.RE_OVERLOAD)
+
+
+class PrefetchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.browser = module_web.Browser()
+        self.get_url = lambda browser, page: 'http://host/%s' % page
+
+    def _run(self, prefetch):
+        prefetch.response = Mock()
+        prefetch._event.set()
+
+    def test_prefetch(self):
+        with nested(patch.object(module_web.Browser, '_clone'),
+                patch.object(module_web.Prefetch, 'run', autospec=True),
+                ) as (mock_clone, mock_run):
+            mock_run.side_effect = self._run
+            self.browser.prefetch(self.get_url, [2, 3])
+            for i in range(100):
+                if len(self.browser._prefetched) == 2:
+                    break
+                time.sleep(.01)
+            self.assertEqual(self.browser._prefetched.keys(), ['http://host/2', 'http://host/3'])
+
+            prefetch = self.browser._get_prefetched('http://host/2')
+            self.assertTrue(prefetch.response)
+            self.assertEqual(self.browser._get_prefetched('http://host/2'), None)
+            self.assertEqual(self.browser._get_prefetched('http://host/4'), None)
+
+            # The prefetched pages are not fetched again
+            self.browser._prefetch(self.get_url, 'http://host/3', [3], Event())
+            self.assertEqual(mock_run.call_count, 2)
+
+    def test_failure(self):
+        with nested(patch.object(module_web.Browser, '_clone'),
+                patch.object(module_web.Prefetch, 'run', autospec=True),
+                ) as (mock_clone, mock_run):
+            mock_run.side_effect = lambda prefetch: prefetch._event.set()
+            self.browser._prefetch(self.get_url, 'http://host/2', [2, 3], Event())
+            self.assertEqual(self.browser._prefetched.keys(), ['http://host/2'])
+            self.assertEqual(self.browser._get_prefetched('http://host/2'), None)
+
+    def test_stop(self):
+        with nested(patch.object(module_web.Browser, '_clone'),
+                patch.object(module_web.Prefetch, 'run', autospec=True),
+                patch.object(module_web.Prefetch, 'cancel', autospec=True),
+                ) as (mock_clone, mock_run, mock_cancel):
+            mock_run.side_effect = self._run
+            stop = self.browser._prefetch_stop
+            self.browser._prefetch(self.get_url, 'http://host/2', [2], stop)
+            self.browser.stop_prefetch()
+            self.assertTrue(stop.is_set())
+            self.assertEqual(mock_cancel.call_count, 1)
+            self.assertEqual(self.browser._prefetched.keys(), [])
+
+            self.browser._prefetch(self.get_url, 'http://host/3', [3], stop)
+            self.assertEqual(mock_run.call_count, 1)
+            self.assertFalse(self.browser._prefetch_stop.is_set())
+
+    def test_next_url(self):
+        obj = module_web.Base.__new__(module_web.Base)
+        self.assertEqual(obj._next_url(2), None)
+
+
+class ConcurrentResultsTest(unittest.TestCase):
+
+    def _plugin_results(self, plugin, query, **kwargs):
+        if plugin == 'slow':
+            time.sleep(.5)
+        yield plugin
+        if plugin == 'failed':
+            yield None
+
+    def test_results(self):
+        with patch.object(module_search, '_plugin_results', side_effect=self._plugin_results):
+            res = list(module_search.results('test',
+                    plugins=['plugin', 'failed', 'slow'], concurrent=True,
+                    dedupe_results=False))
+            self.assertEqual(sorted(res), sorted([None, 'plugin', 'failed', 'slow']))
+
+            res = list(module_search.results('test', plugins=['plugin', 'slow'],
+                    concurrent=True, plugin_timeout=.1, dedupe_results=False))
+            self.assertEqual(res, ['plugin', None])
+
+    def test_cancel(self):
+        stopped = Event()
+
+        def plugin_results(plugin, query, **kwargs):
+            try:
+                yield plugin
+                while True:     # next pages requests
+                    time.sleep(.05)
+                    check()
+            finally:
+                stopped.set()
+
+        with patch.object(module_search, '_plugin_results', side_effect=plugin_results):
+            res = module_search.results('test', plugins=['plugin'],
+                    concurrent=True, plugin_timeout=10, dedupe_results=False)
+            self.assertEqual(res.next(), 'plugin')
+            res.close()
+            self.assertTrue(stopped.wait(1))
+
+
+class SearchCacheTest(unittest.TestCase):
+
+    class Plugin(object):
+
+        def __init__(self):
+            self.browser = Mock()
+            self.searches = 0
+            self.resolved = 0
+
+        def _resolve_url(self, url):
+            self.resolved += 1
+            return {'url': 'magnet:?%s' % url}
+
+        def results(self, query, **kwargs):
+            self.searches += 1
+            for i in range(3):
+                result = Result()
+                result.title = '%s %s' % (query, i)
+                result.hash = str(i)
+                result.defer(['url'], self._resolve_url, 'url%s' % i)
+                yield result
+
+    def setUp(self):
+        self.cache = {}
+        self.obj = self.Plugin()
+
+    @contextmanager
+    def _patch(self):
+        with nested(patch.object(module_search.registry, 'acquire'),
+                patch.object(module_search.registry, 'release'),
+                patch.object(module_search, '_get_results_ttl'),
+                patch.object(module_search.SearchCache, 'get_results'),
+                patch.object(module_search.SearchCache, 'set_results'),
+                ) as (mock_acquire, mock_release, mock_ttl, mock_get, mock_set):
+            mock_acquire.return_value = self.obj
+            mock_ttl.return_value = 60
+            mock_get.side_effect = lambda key, ttl: copy.deepcopy(self.cache.get(key))
+            mock_set.side_effect = lambda key, results: self.cache.__setitem__(key, copy.deepcopy(results))
+            yield
+
+    def test_cache(self):
+        with self._patch():
+            res = list(module_search.results('test', plugins=['plugin'], pages_max=2))
+            self.assertEqual(len(res), 3)
+            self.assertEqual(len(self.cache), 1)
+
+            res = list(module_search.results('test', plugins=['plugin'], pages_max=2))
+            self.assertEqual(self.obj.searches, 1)
+            self.assertEqual([r.title for r in res], ['test 0', 'test 1', 'test 2'])
+            self.assertEqual(res[0].plugin, 'plugin')
+            self.assertFalse('url' in res[0])
+            self.assertEqual(res[0].url, 'magnet:?url0')
+            self.assertEqual(self.obj.resolved, 1)
+
+            list(module_search.results('test', plugins=['plugin'], pages_max=3))
+            list(module_search.results('test', plugins=['plugin'], pages_max=2, use_cache=False))
+            self.assertEqual(self.obj.searches, 3)
+
+    def test_partial(self):
+        with self._patch():
+            for result in module_search.results('test', plugins=['plugin']):
+                break
+            self.assertEqual(self.cache, {})
+
+    def test_updated_after_yield(self):
+        with self._patch():
+            for result in module_search.results('test', plugins=['plugin']):
+                result.seeds = 10
+                result.plugins.append('other')
+            docs = self.cache.values()[0]
+            self.assertEqual(len(docs), 3)
+            for doc in docs:
+                self.assertFalse('seeds' in doc)
+                self.assertFalse('plugins' in doc)
+
+
+class IncrementalResultsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.info = {}
+        self.date = datetime(2013, 1, 10)
+
+    def _get_results(self, items):
+        for day, hash in items:
+            result = Result()
+            result.hash = hash
+            result.date = self.date - timedelta(days=day)
+            yield result
+
+    def _search(self, items, margin=2):
+        with nested(patch.object(Work, 'get_info'),
+                patch.object(Work, 'set_info'),
+                ) as (mock_get, mock_set):
+            mock_get.side_effect = lambda section, key, default: \
+                    self.info.get(section, {}).get(key, default)
+            mock_set.side_effect = lambda section, key, val: \
+                    self.info.setdefault(section, {}).__setitem__(key, val)
+            results = self._get_results(items)
+            res = module_search.incremental_results(results,
+                    'search_id', 'plugin', margin=margin)
+            return [r.hash for r in res]
+
+    def test_results(self):
+        items = [(0, 'a'), (0, 'b'), (1, 'c'), (2, 'd')]
+        self.assertEqual(self._search(items), ['a', 'b', 'c', 'd'])
+        self.assertEqual(self.info['hwm.search_id']['plugin'], {'date': self.date, 'keys': ['a', 'b']})
+
+        # Skip the known results and stop after the margin
+        items = [(0, 'e'), (0, 'a'), (0, 'f'), (1, 'g'), (2, 'h'), (3, 'i')]
+        self.assertEqual(self._search(items), ['e', 'f'])
+        self.assertEqual(self.info['hwm.search_id']['plugin'], {'date': self.date, 'keys': ['a', 'b', 'e', 'f']})
+
+        self.date += timedelta(days=1)
+        items = [(0, 'j'), (1, 'e'), (1, 'b'), (1, 'k')]
+        self.assertEqual(self._search(items), ['j'])
+        self.assertEqual(self.info['hwm.search_id']['plugin'], {'date': self.date, 'keys': ['j']})
+
+    def test_failure(self):
+        results = list(self._get_results([(0, 'a')])) + [None]
+        with patch.object(Work, 'get_info', return_value=None), \
+                patch.object(Work, 'set_info') as mock_set:
+            res = list(module_search.incremental_results(iter(results), 'search_id', 'plugin'))
+        self.assertEqual(res[-1], None)
+        self.assertFalse(mock_set.called)
+
+    def test_remove_marks(self):
+        with patch.object(Work, 'remove') as mock_remove:
+            module_search.remove_marks('search_id')
+        mock_remove.assert_called_once_with({'section': 'hwm.search_id'}, safe=True)
+
+        with nested(patch.object(Search, 'find'),
+                patch('mediacore.utils.db.Model.remove'),
+                patch.object(Work, 'remove'),
+                ) as (mock_find, mock_remove, mock_remove_marks):
+            mock_find.return_value = [{'_id': 'id1'}, {'_id': 'id2'}]
+            Search.remove({'name': 'name'}, safe=True)
+        mock_remove.assert_called_once_with({'name': 'name'}, safe=True)
+        self.assertEqual([c[0][0] for c in mock_remove_marks.call_args_list],
+                [{'section': 'hwm.id1'}, {'section': 'hwm.id2'}])
+
+        with nested(patch.object(Search, 'find'),
+                patch('mediacore.utils.db.Model.remove'),
+                patch.object(Work, 'remove'),
+                ) as (mock_find, mock_remove, mock_remove_marks):
+            id = ObjectId()
+            mock_find.return_value = [{'_id': id}]
+            Search.remove(id, safe=True)
+        mock_find.assert_called_once_with({'_id': id}, fields=['_id'])
+        mock_remove.assert_called_once_with(id, safe=True)
+        mock_remove_marks.assert_called_once_with({'section': 'hwm.%s' % id}, safe=True)
+
+
+class PluginRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = PluginRegistry(settings_ttl=60, object_ttl=60, pool_size=2)
+        self.settings = {'username': 'user'}
+
+    @contextmanager
+    def _patch(self):
+        with nested(patch('mediacore.web.search._get_plugins'),
+                patch('mediacore.web.search._get_plugin_object'),
+                patch('mediacore.web.search.Settings.get_settings'),
+                ) as (mock_plugins, mock_object, mock_settings):
+            mock_plugins.return_value = ['plugin1', 'plugin2']
+            mock_object.side_effect = lambda plugin, args: Mock()
+            mock_settings.side_effect = lambda plugin: dict(self.settings)
+            yield mock_plugins, mock_object, mock_settings
+
+    def test_plugins(self):
+        with self._patch() as (mock_plugins, mock_object, mock_settings):
+            for i in range(3):
+                self.assertEqual(self.registry.get_plugins(), ['plugin1', 'plugin2'])
+            self.assertEqual(mock_plugins.call_count, 1)
+            self.registry.invalidate()
+            self.registry.get_plugins()
+            self.assertEqual(mock_plugins.call_count, 2)
+
+    def test_objects(self):
+        with self._patch() as (mock_plugins, mock_object, mock_settings):
+            obj = self.registry.acquire('plugin1')
+            obj2 = self.registry.acquire('plugin1')
+            self.assertFalse(obj is obj2)
+            self.registry.release('plugin1', obj)
+            self.registry.release('plugin1', obj2, discard=True)
+            self.assertTrue(self.registry.acquire('plugin1') is obj)
+            self.assertEqual(mock_object.call_count, 2)
+            self.assertEqual(mock_settings.call_count, 1)
+
+            self.registry.release('plugin1', obj)
+            self.settings = {'username': 'user2'}
+            self.registry.invalidate('plugin1')
+            self.assertFalse(self.registry.acquire('plugin1') is obj)
+            self.assertEqual(mock_settings.call_count, 2)
+
+
+class DeferredResultTest(unittest.TestCase):
+
+    def setUp(self):
+        self.resolver = Mock()
+        self.resolver.return_value = {'url': 'magnet:?xt=urn:btih:abc', 'hash': 'abc'}
+
+    def test_access(self):
+        result = Result()
+        result.defer(('url', 'hash'), self.resolver, 'query', 'http://host/abc')
+        self.assertFalse('url' in result)
+        self.assertEqual(result.url, 'magnet:?xt=urn:btih:abc')
+        self.assertEqual(result.get('hash'), 'abc')
+        self.assertEqual(result['url'], 'magnet:?xt=urn:btih:abc')
+        self.resolver.assert_called_once_with('query', 'http://host/abc')
+        self.assertFalse(result.is_deferred('hash'))
+
+    def test_eager_values(self):
+        result = Result()
+        result.hash = 'def'
+        result.defer(('url',), self.resolver)
+        self.assertEqual(module_search._get_result_key(result), 'def')
+        self.assertFalse(self.resolver.called)
+        self.assertTrue(result.resolve())
+        self.assertEqual(result.hash, 'def')
+
+    def test_add_result(self):
+        with nested(patch.object(ResultModel, 'update'),
+                patch.object(ResultModel, 'insert')) as (update, insert):
+            result = Result()
+            result.hash = 'abc'
+            result.defer(('url',), Mock(return_value=None))
+            ResultModel.add_result(result, 'search_id')
+            self.assertFalse(update.called)
+            self.assertFalse(insert.called)
+
+            update.return_value = {'updatedExisting': False}
+            result = Result()
+            result.defer(('url', 'hash'), self.resolver)
+            ResultModel.add_result(result, 'search_id')
+            spec, doc = update.call_args[0]
+            self.assertEqual(spec, {'search_id': 'search_id', 'hash': 'abc'})
+            self.assertEqual(doc['$set']['url'], 'magnet:?xt=urn:btih:abc')
+            self.assertTrue(insert.called)
+
+    def test_failure(self):
+        self.resolver.side_effect = ValueError('failed')
+        result = Result()
+        result.defer(('url',), self.resolver)
+        self.assertEqual(result.url, None)
+        self.assertRaises(KeyError, lambda: Result()['url'])
+        self.assertFalse(result.resolve())
+        self.assertEqual(self.resolver.call_count, 1)
+
+    def test_resolve(self):
+        results = []
+        for i in range(5):
+            result = Result()
+            result.defer(('url',), lambda i: {'url': 'url%s' % i} if i % 2 else None, i)
+            results.append(result)
+        res = module_search.resolve(results + [None], workers=2)
+        self.assertEqual([r.url for r in res], ['url1', 'url3'])
+
+
+class ResultsStreamTest(unittest.TestCase):
+
+    def _get_result(self, plugin, hash=None, url=None, seeds=None, date=None):
+        result = Result()
+        result.plugin = plugin
+        result.hash = hash
+        result.url = url
+        result.seeds = seeds
+        result.date = date
+        return result
+
+    def test_dedupe(self):
+        date = datetime(2013, 1, 1)
+        results = [
+            self._get_result('thepiratebay', hash='abc', seeds=10, date=date),
+            None,
+            self._get_result('torrentz', hash='abc', seeds=20, date=date - timedelta(days=1)),
+            self._get_result('filestube', url='http://Host.com/file?b=2&a=1'),
+            self._get_result('binsearch', url='http://host.com/file?a=1&b=2#x'),
+            self._get_result('bitsnoop', hash='def'),
+            ]
+        merged = []
+        res = list(module_search.dedupe(results, on_merge=merged.append))
+        self.assertEqual(len(res), 4)
+        self.assertEqual(res[1], None)
+        self.assertEqual(res[0].seeds, 20)
+        self.assertEqual(res[0].date, date - timedelta(days=1))
+        self.assertEqual(res[0].plugins, ['thepiratebay', 'torrentz'])
+        self.assertEqual(res[2].plugins, ['filestube', 'binsearch'])
+        self.assertEqual(res[3].plugins, ['bitsnoop'])
+        self.assertEqual(len(merged), 2)
+        self.assertTrue(merged[0] is res[0])
+        self.assertTrue(merged[1] is res[2])
+
+        res = list(module_search.dedupe([
+                self._get_result('torrentz', hash='abc', seeds=20),
+                self._get_result('torrentz', hash='abc', seeds=10),
+                ]))
+        self.assertEqual(len(res), 1)
+
+    def test_top_results_updated(self):
+        results = [
+            self._get_result('thepiratebay', hash='abc', seeds=10),
+            self._get_result('bitsnoop', hash='def', seeds=20),
+            self._get_result('torrentz', hash='abc', seeds=30),
+            ]
+        res = list(module_search.top_results(module_search.dedupe(results), 2,
+                min_seeds=25))
+        self.assertEqual([r.seeds for r in res], [30, 20])
+        self.assertEqual(res[0].plugins, ['thepiratebay', 'torrentz'])
+
+        results = [
+            self._get_result('thepiratebay', hash='abc', seeds=10),
+            self._get_result('bitsnoop', hash='def', seeds=20),
+            self._get_result('torrentz', hash='abc', seeds=30),
+            self._get_result('filestube', hash='ghi', seeds=15),
+            ]
+        res = list(module_search.top_results(module_search.dedupe(results), 2))
+        self.assertEqual([r.seeds for r in res], [30, 20])
+
+    def test_max_size(self):
+        results = [self._get_result('plugin', hash=str(i % 3)) for i in range(6)]
+        self.assertEqual(len(list(module_search.dedupe(results, max_size=2))), 6)
+        self.assertEqual(len(list(module_search.dedupe(results, max_size=3))), 3)
+
+    def test_top_results(self):
+        consumed = []
+
+        def results():
+            for seeds in (5, None, 50, 20, 30, 40, 100):
+                if seeds is None:
+                    yield None
+                    continue
+                consumed.append(seeds)
+                yield self._get_result('plugin', hash=str(seeds), seeds=seeds)
+
+        res = list(module_search.top_results(results(), 2))
+        self.assertEqual(res[0], None)
+        self.assertEqual([r.seeds for r in res[1:]], [100, 50])
+        self.assertEqual(consumed, [5, 50, 20, 30, 40, 100])
+
+        del consumed[:]
+        res = list(module_search.top_results(results(), 2, min_seeds=30))
+        self.assertEqual([r.seeds for r in res[1:]], [50, 30])
+        self.assertEqual(consumed, [5, 50, 20, 30])
+
+        del consumed[:]
+        res = list(module_search.top_results(results(), 2,
+                good_enough=lambda r: r.seeds > 1000))
+        self.assertEqual([r.seeds for r in res[1:]], [100, 50])
+        self.assertEqual(len(consumed), 6)
+
+
 class GoogleTest(unittest.TestCase):
 
     def setUp(self):
@@ -327,6 +1546,25 @@ class GoogleTest(unittest.TestCase):
         self.assertTrue(res > 0, 'failed to get results count for "%s"' % GENERIC_QUERY)
 
 
+class YoutubeTimeoutTest(unittest.TestCase):
+
+    def setUp(self):
+        self.url = atom.url.parse_url('http://gdata.youtube.com/feeds')
+
+    def test_connection_timeout(self):
+        client = Youtube().yt_service.http_client
+        self.assertTrue(isinstance(client, YoutubeHttpClient))
+        with deadline(2):
+            connection = client._prepare_connection(self.url, {})
+        self.assertTrue(0 < connection.timeout <= 2)
+
+    def test_deadline_exceeded(self):
+        client = YoutubeHttpClient()
+        with deadline(0):
+            self.assertRaises(TimeoutError, client._prepare_connection,
+                    self.url, {})
+
+
 class YoutubeTest(unittest.TestCase):
 
     def setUp(self):
@@ -780,6 +2018,60 @@ class ThepiratebayTest(unittest.TestCase):
             self.assertEqual(len(mock_next.call_args_list), self.pages_max - 1)
 
 
+class TorrentzMirrorsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.obj = Torrentz.__new__(Torrentz)
+        self.mirror_urls = ['http://slow/1', 'http://dead/2', 'http://fast/3']
+        self.magnet = 'magnet:?xt=urn:btih:%s&dn=Test+Query+720p' % ('a' * 40)
+
+    def _get_torrent_urls(self, url):
+        if url.startswith('http://slow'):
+            try:
+                for i in range(100):
+                    time.sleep(.01)
+                    check()
+            except TimeoutError:    # cancelled
+                return None
+            return [self.magnet]
+        elif url.startswith('http://fast'):
+            return ['magnet:?xt=urn:btih:b&dn=Other', self.magnet]
+
+    def test_get_torrent_url(self):
+        with nested(patch.object(Torrentz, '_mirror_urls'),
+                patch.object(Torrentz, '_get_torrent_urls'),
+                patch.object(module_mirrors, 'mirrors', MirrorCache()),
+                ) as (mock_mirrors, mock_urls, mock_cache):
+            mock_mirrors.return_value = iter(self.mirror_urls)
+            mock_urls.side_effect = self._get_torrent_urls
+
+            begin = time.time()
+            self.assertEqual(self.obj._get_torrent_url('test query', 'http://torrentz/x'), self.magnet)
+            self.assertTrue(time.time() - begin < .5)
+            self.assertFalse(mock_cache.get_info('http://dead')['alive'])
+            self.assertTrue(mock_cache.get_info('http://fast')['alive'])
+
+            time.sleep(.1)
+            self.assertEqual(mock_cache.get_info('http://slow'), {})
+            self.assertEqual(mock_cache.sort(self.mirror_urls)[0], 'http://fast/3')
+
+
+class BinsearchMirrorTest(unittest.TestCase):
+
+    def test_results_cached_mirror(self):
+        cache = MirrorCache()
+        cache.record('http://www.binsearch.info', alive=True)
+        with nested(patch.object(module_mirrors, 'mirrors', cache),
+                patch.object(module_web.Browser, 'open'),
+                ) as (mock_cache, mock_open):
+            mock_open.return_value = None
+            obj = Binsearch()
+            self.assertFalse(mock_open.called)
+
+            self.assertRaises(SearchError, list, obj.results('test'))
+            mock_open.assert_called_once_with('http://www.binsearch.info')
+
+
 def check_torrentz():
     obj = Torrentz()
     with nested(patch.object(module_web, '_validate_rate'),